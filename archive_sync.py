@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cloud_storage import CloudStorage
+import atomic_file
+
+# Uploads the local IL2 archive to the bucket, skipping objects whose MD5
+# already matches. Local hashes are remembered by size and mtime in
+# SYNC_STATE_PATH, so unchanged files are not re-read on every sync.
+JSON_DIR = os.path.join("archive", "text_archive", "IL2")
+AUDIO_DIR = os.path.join("archive", "IL2")
+SYNC_STATE_PATH = os.getenv('SYNC_STATE_PATH', os.path.join('archive', 'cache', 'cloud_sync.json'))
+SYNC_WORKERS = int(os.getenv('SYNC_WORKERS', '8'))
+
+# Audio is sent as a resumable upload in chunks of this size (a multiple of 256 KiB),
+# so a dropped connection retries the current chunk instead of the whole file
+AUDIO_CHUNK_SIZE = 8 * 1024 * 1024
+
+def load_state():
+    """Local file hashes from earlier syncs: {path: {'size', 'mtime', 'md5'}}"""
+    if not os.path.exists(SYNC_STATE_PATH):
+        return {}
+    try:
+        with open(SYNC_STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading sync state: {str(e)}")
+        return {}
+
+def save_state(state):
+    """Save the sync state using atomic write"""
+    try:
+        atomic_file.write_json(SYNC_STATE_PATH, state)
+    except Exception as e:
+        print(f"Error saving sync state: {str(e)}")
+
+def file_md5(path, state):
+    """Base64 MD5 of a file as reported by Cloud Storage, reusing the state entry if the file is unchanged"""
+    stat = os.stat(path)
+    entry = state.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['md5']
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    md5 = base64.b64encode(digest.digest()).decode()
+    state[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': md5}
+    return md5
+
+def local_archive():
+    """Files to upload and the manifest entries they produce
+
+    The bucket keeps one JSON per day (the latest run) and every run's audio,
+    matching CloudStorage.upload_analysis.
+
+    Returns (uploads, entries): uploads is a list of (local_path, blob_name),
+    entries maps YYYYMMDD to {'json', 'timestamp', 'audio'}.
+    """
+    latest = {}
+    if os.path.isdir(JSON_DIR):
+        for file in sorted(os.listdir(JSON_DIR)):
+            parts = file.split('_')  # IL2_20250126_173220_log.json
+            if file.endswith("_log.json") and len(parts) >= 4:
+                latest[parts[1]] = (f"{parts[1]}_{parts[2]}", os.path.join(JSON_DIR, file))
+
+    uploads = []
+    entries = {}
+    for date, (timestamp, json_path) in latest.items():
+        entry = {'json': f"text_archive/IL2/IL2_{date}_log.json", 'timestamp': timestamp, 'audio': None}
+        uploads.append((json_path, entry['json']))
+        entries[date] = entry
+
+    if os.path.isdir(AUDIO_DIR):
+        for file in sorted(os.listdir(AUDIO_DIR)):
+            parts = file.split('_')  # IL2_20250126_173220_analysis.mp3
+            if file.endswith("_analysis.mp3") and len(parts) >= 4:
+                blob_name = f"audio/IL2/{file}"
+                uploads.append((os.path.join(AUDIO_DIR, file), blob_name))
+                entry = entries.get(parts[1])
+                if entry and entry['timestamp'] == f"{parts[1]}_{parts[2]}":
+                    entry['audio'] = blob_name
+    return uploads, entries
+
+def remote_hashes(storage):
+    """MD5 of every archive object in the bucket, from one listing per prefix"""
+    hashes = {}
+    for prefix in ("text_archive/IL2/", "audio/IL2/"):
+        for blob in storage.storage_client.list_blobs(storage.bucket_name, prefix=prefix):
+            hashes[blob.name] = blob.md5_hash
+    return hashes
+
+def upload_file(storage, path, blob_name):
+    """Upload one file, in resumable chunks for audio; returns the number of bytes sent"""
+    blob = storage.bucket.blob(blob_name)
+    if blob_name.endswith('.mp3'):
+        blob.chunk_size = AUDIO_CHUNK_SIZE
+        blob.upload_from_filename(path, content_type='audio/mpeg')
+    else:
+        blob.upload_from_filename(path, content_type='application/json')
+    return os.path.getsize(path)
+
+def sync(storage=None, workers=None, dry_run=False):
+    """Upload new or changed archive files concurrently and update the bucket manifest
+
+    Returns {'uploaded', 'skipped', 'failed', 'bytes'}.
+    """
+    storage = storage or CloudStorage()
+    state = load_state()
+    uploads, entries = local_archive()
+    remote = remote_hashes(storage)
+
+    pending = [(path, blob_name) for path, blob_name in uploads if remote.get(blob_name) != file_md5(path, state)]
+    save_state(state)
+    summary = {'uploaded': 0, 'skipped': len(uploads) - len(pending), 'failed': 0, 'bytes': 0}
+    print(f"{len(uploads)} archive files, {summary['skipped']} already in the bucket, {len(pending)} to upload")
+    if dry_run:
+        for path, blob_name in pending:
+            print(f"Would upload {path} -> {blob_name}")
+        return summary
+
+    start = time.monotonic()
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers or SYNC_WORKERS) as executor:
+        futures = {executor.submit(upload_file, storage, path, blob_name): (path, blob_name) for path, blob_name in pending}
+        for future in as_completed(futures):
+            path, blob_name = futures[future]
+            try:
+                summary['bytes'] += future.result()
+                summary['uploaded'] += 1
+            except Exception as e:
+                summary['failed'] += 1
+                failed.add(blob_name)
+                print(f"Error uploading {path}: {str(e)}")
+            done = summary['uploaded'] + summary['failed']
+            elapsed = max(time.monotonic() - start, 0.001)
+            print(f"[{done}/{len(pending)}] {blob_name}  {summary['bytes'] / 1024 / 1024:.1f} MB at {summary['bytes'] / 1024 / 1024 / elapsed:.1f} MB/s")
+
+    # One conditional manifest write for the whole sync, listing only objects now in the bucket
+    entries = {date: entry for date, entry in entries.items() if entry['json'] not in failed}
+    for entry in entries.values():
+        if entry['audio'] in failed:
+            entry['audio'] = None
+    if entries and (summary['uploaded'] or not storage.get_manifest()):
+        storage.update_manifest(entries)
+    print(f"Uploaded {summary['uploaded']} files ({summary['bytes'] / 1024 / 1024:.1f} MB), "
+          f"skipped {summary['skipped']}, failed {summary['failed']}")
+    return summary
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print("\nUsage: python archive_sync.py [--dry-run] [--workers N]")
+        print("\nUploads new or changed IL2 analyses and audio to the bucket and updates its manifest")
+    else:
+        workers = int(args[args.index('--workers') + 1]) if '--workers' in args else None
+        sync(workers=workers, dry_run='--dry-run' in args)
@@ -0,0 +1,486 @@
+import os
+import sys
+import json
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+import aiohttp
+import feedparser
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+import provider_http
+import country_engine
+import cloud_upload
+import llm
+import translation
+import audio_jobs
+import checkpoints
+import run_fingerprint
+from provider_limits import get_provider_limit
+
+# Load environment variables
+load_dotenv()
+
+NEWSDATA_URL = "https://newsdata.io/api/1/news"
+NEWSAPI_EVERYTHING_URL = "https://newsapi.org/v2/everything"
+NEWSAPI_TOP_HEADLINES_URL = "https://newsapi.org/v2/top-headlines"
+SERPAPI_URL = "https://serpapi.com/search.json"
+GOOGLE_TRANSLATE_URL = "https://translate.google.com/m"
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# The async pipeline runs the same per-country configuration as the sync engine
+ASYNC_COUNTRIES = country_engine.COUNTRIES
+
+class AsyncProviderClient:
+    def __init__(self):
+        """asyncio-native clients for news, trends, translation and the LLM
+
+        One instance shares a single connection pool and one semaphore per provider
+        (sized from provider_limits), so many countries and sub-requests can run on
+        one event loop. Use it as an async context manager.
+        """
+        self._session = None
+        self._openai = None
+        self._semaphores = {}
+
+    async def __aenter__(self):
+        connect_timeout, read_timeout = provider_http.DEFAULT_TIMEOUT
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=provider_http.POOL_MAXSIZE),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        if self._openai is not None:
+            await self._openai.close()
+
+    @property
+    def openai(self):
+        """AsyncOpenAI client, created on first use"""
+        if self._openai is None:
+            self._openai = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return self._openai
+
+    def semaphore(self, provider):
+        """Get the semaphore bounding concurrent calls to a provider"""
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(get_provider_limit(provider))
+        return self._semaphores[provider]
+
+    async def request(self, method, url, provider=None, retries=None, read_timeout=None, **kwargs):
+        """Send a request with provider_http's retry policy
+
+        Returns (status, headers, body). Connection errors are re-raised after the last attempt.
+        """
+        retries = provider_http.MAX_RETRIES if retries is None else retries
+        if read_timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(sock_connect=provider_http.DEFAULT_TIMEOUT[0], sock_read=read_timeout)
+        if kwargs.get('params'):
+            kwargs['params'] = {k: v for k, v in kwargs['params'].items() if v is not None}
+        host = urlsplit(url).netloc
+
+        for attempt in range(retries + 1):
+            try:
+                async with (self.semaphore(provider) if provider else nullcontext()):
+                    async with self._session.request(method, url, **kwargs) as response:
+                        status = response.status
+                        headers = response.headers
+                        body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    raise
+                delay = provider_http.retry_delay(attempt)
+                print(f"{method} {host} failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if provider:
+                provider_http.record_quota_headers(provider, status, headers)
+            if status not in provider_http.RETRY_STATUS_CODES or attempt >= retries:
+                return status, headers, body
+
+            delay = provider_http.retry_delay(attempt, headers.get('Retry-After'))
+            print(f"{method} {host} returned {status}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url, provider=None, **kwargs):
+        """GET a JSON endpoint, returning (status, data) with {} for undecodable bodies"""
+        status, _, body = await self.request('GET', url, provider=provider, **kwargs)
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            print(f"Failed to decode JSON response from {urlsplit(url).netloc}")
+            return status, {}
+
+    async def newsdata_news(self, country, language, category='top'):
+        """Top news from NewsData.io"""
+        params = {
+            'apikey': os.getenv('NEWSDATA_API_KEY'),
+            'country': country,
+            'language': language,
+            'category': category
+        }
+        headers = {'Accept': 'application/json', 'User-Agent': BROWSER_USER_AGENT}
+        return await self.get_json(NEWSDATA_URL, provider='newsdata', params=params, headers=headers)
+
+    async def newsapi_everything(self, query, from_date, to_date, language='en'):
+        """NewsAPI /everything search sorted by relevancy"""
+        params = {
+            'q': query,
+            'language': language,
+            'sortBy': 'relevancy',
+            'from': from_date,
+            'to': to_date
+        }
+        headers = {'X-Api-Key': os.getenv('NEWS_API_KEY') or ''}
+        return await self.get_json(NEWSAPI_EVERYTHING_URL, provider='newsapi', params=params, headers=headers)
+
+    async def newsapi_top_headlines(self, query, language='en'):
+        """NewsAPI /top-headlines search"""
+        params = {'q': query, 'language': language}
+        headers = {'X-Api-Key': os.getenv('NEWS_API_KEY') or ''}
+        return await self.get_json(NEWSAPI_TOP_HEADLINES_URL, provider='newsapi', params=params, headers=headers)
+
+    async def rss_feed(self, url):
+        """Fetch and parse an RSS feed"""
+        _, _, body = await self.request('GET', url, provider='rss')
+        return feedparser.parse(body)
+
+    async def trending_now(self, geo, hl, hours):
+        """Google Trends 'trending now' searches via SerpApi"""
+        params = {
+            'api_key': os.getenv('SERPAPI_KEY'),
+            'engine': 'google_trends_trending_now',
+            'geo': geo,
+            'hours': hours,
+            'hl': hl
+        }
+        return await self.get_json(SERPAPI_URL, provider='serpapi', params=params)
+
+    async def _google_translate(self, text, source, target):
+        """Translate text with one request to Google Translate's mobile page"""
+        params = {'tl': target, 'sl': source, 'q': text}
+        status, _, body = await self.request('GET', GOOGLE_TRANSLATE_URL, provider='google_translate', params=params)
+        if status != 200:
+            raise RuntimeError(f"Google Translate returned status {status}")
+        soup = BeautifulSoup(body, 'html.parser')
+        element = soup.find('div', {'class': 't0'}) or soup.find('div', {'class': 'result-container'})
+        if not element:
+            raise ValueError(f"No translation found for '{text}'")
+        return element.get_text(separator=translation.BATCH_SEPARATOR, strip=True)
+
+    async def translate(self, text, source='auto', target='en'):
+        """Translate text through the shared translation cache"""
+        source = translation.normalize_language(source)
+        target = translation.normalize_language(target)
+        # The SQLite cache is read and written in a worker thread, off the event loop
+        cached = await asyncio.to_thread(translation.get_cached, text, source, target)
+        if cached is not None:
+            return cached
+        translated = await self._google_translate(text, source, target)
+        if translated:
+            await asyncio.to_thread(translation.store_cached, text, source, target, translated)
+        return translated
+
+    async def _translate_packed(self, batch, source, target):
+        """Translate one packed chunk, None if it can't be unpacked"""
+        try:
+            translated = await self._google_translate(translation.BATCH_SEPARATOR.join(batch), source, target)
+        except Exception as e:
+            print(f"Batched translation error: {str(e)}")
+            return None
+        return translation.unpack_batch(batch, translated)
+
+    async def translate_batch(self, texts, source='auto', target='en'):
+        """Async counterpart of translation.translate_batch; chunks are sent concurrently"""
+        source = translation.normalize_language(source)
+        target = translation.normalize_language(target)
+
+        def lookup_cached():
+            results = {}
+            pending = []
+            for text in dict.fromkeys(texts):
+                cached = translation.get_cached(text, source, target)
+                if cached is not None:
+                    results[text] = cached
+                elif not text.strip():
+                    results[text] = text
+                else:
+                    pending.append(text)
+            return results, pending
+
+        def store_translated(translated):
+            for text, result in translated.items():
+                translation.store_cached(text, source, target, result)
+
+        # Cache lookups and writes run in worker threads, off the event loop
+        results, pending = await asyncio.to_thread(lookup_cached)
+
+        packable = [text for text in pending if translation.is_packable(text)]
+        singles = [text for text in pending if text not in packable]
+        batches = translation.pack_batches(packable)
+
+        batch_translated = {}
+        for batch, lines in zip(batches, await asyncio.gather(*(self._translate_packed(b, source, target) for b in batches))):
+            if lines is None:
+                singles.extend(batch)
+                continue
+            for text, translated in zip(batch, lines):
+                results[text] = translated or text
+                if translated:
+                    batch_translated[text] = translated
+        if batch_translated:
+            await asyncio.to_thread(store_translated, batch_translated)
+
+        async def translate_single(text):
+            try:
+                return await self.translate(text, source=source, target=target) or text
+            except Exception as e:
+                print(f"Translation error for '{text}': {str(e)}")
+                return text
+
+        for text, translated in zip(singles, await asyncio.gather(*(translate_single(t) for t in singles))):
+            results[text] = translated
+
+        return [results[text] for text in texts]
+
+    async def chat(self, model, system, prompt, temperature, max_tokens):
+        """Chat completion with the async OpenAI client, sharing the LLM response cache"""
+        cached = await asyncio.to_thread(llm.get_cached, model, system, prompt, temperature)
+        if cached is not None:
+            return cached
+        async with self.semaphore('openai'):
+            response = await self.openai.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        content = response.choices[0].message.content
+        await asyncio.to_thread(llm.store_cached, model, system, prompt, temperature, content)
+        return content
+
+async def fetch_headlines(client, config):
+    """Fetch raw headlines for a country, [] on errors like country_engine.get_current_news"""
+    try:
+        headlines = await fetch_provider_headlines(client, config)
+    except Exception as e:
+        print(f"[{config['key']}] Error fetching news: {str(e)}")
+        return []
+    print(f"[{config['key']}] Found {len(headlines)} unique headlines")
+    return headlines
+
+async def fetch_provider_headlines(client, config):
+    """Raw headlines from the country's news provider"""
+    news = config['news']
+    if news['provider'] == 'newsdata':
+        status, data = await client.newsdata_news(news['country'], news['language'])
+        headlines = []
+        if status == 200 and data.get('status') == 'success':
+            headlines = country_engine.unique_titles(config, (a.get('title', '') for a in data.get('results', [])))
+        return headlines or list(news.get('fallback', []))
+
+    if news['provider'] == 'newsapi':
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=news.get('days', 7))
+        _, data = await client.newsapi_everything(news['query'], start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        headlines = country_engine.unique_titles(config, (a.get('title', '') for a in data.get('articles', [])))
+        if not headlines:
+            _, data = await client.newsapi_top_headlines(news['query'])
+            headlines = country_engine.unique_titles(config, (a.get('title', '') for a in data.get('articles', [])))
+        return headlines
+
+    if news['provider'] == 'rss':
+        feeds = await asyncio.gather(*(client.rss_feed(url) for url in news['feeds']), return_exceptions=True)
+        titles = []
+        for url, feed in zip(news['feeds'], feeds):
+            if isinstance(feed, Exception):
+                print(f"Error fetching from {url}: {str(feed)}")
+                continue
+            titles.extend(entry.get('title', '') for entry in feed.entries[:news['per_feed']])
+        return country_engine.unique_titles(config, titles)
+
+    raise ValueError(f"Unknown news provider: {news['provider']}")
+
+async def fetch_trending(client, config):
+    """Fetch raw trending searches with their related searches, [] on errors like the sync engine"""
+    trends = config['trends']
+    try:
+        status, data = await client.trending_now(trends['geo'], trends['hl'], trends['hours'])
+    except Exception as e:
+        print(f"[{config['key']}] Error fetching trending searches: {str(e)}")
+        return []
+    all_trends_data = []
+    if status == 200 and 'trending_searches' in data:
+        for trend in data['trending_searches']:
+            title = trend.get('query', '')
+            if not title or (config['filter_news_sources'] and country_engine.is_news_source(title)):
+                continue
+            related = [r for r in trend.get('trend_breakdown', []) if r != title]
+            all_trends_data.append({'title': title, 'related': related[:trends['related_limit']]})
+            if len(all_trends_data) >= 20:
+                break
+    else:
+        print(f"[{config['key']}] Trending searches request returned status {status}")
+    return all_trends_data
+
+async def translate_run(client, config, headlines, trends_data):
+    """Translate headlines and selected trends in one batch, as the sync translate_run does"""
+    pending = country_engine.texts_to_translate(config, headlines, trends_data)
+    translations = dict(zip(pending, await client.translate_batch(pending, source=config['translate_from'], target='en')))
+    return country_engine.with_translations(headlines, trends_data, translations)
+
+async def run_stage(checkpoint, stage, compute, is_valid=bool):
+    """Async counterpart of RunCheckpoint.run for stages computed by a coroutine
+
+    Checkpoint writes (fsync and rename) run in a worker thread, off the event loop.
+    """
+    entry = checkpoint.data['stages'].get(stage)
+    if entry:
+        print(f"Using saved {stage} from run {checkpoint.run_id}")
+        return entry['data']
+    try:
+        result = await compute()
+    except Exception as e:
+        await asyncio.to_thread(checkpoint.fail, stage, str(e))
+        raise
+    if is_valid(result):
+        await asyncio.to_thread(checkpoint.save, stage, result)
+    else:
+        await asyncio.to_thread(checkpoint.fail, stage, f"{stage} stage produced no usable result")
+    return result
+
+async def generate_analysis(client, config, trends_data, headlines):
+    """Async counterpart of country_engine.generate_analysis"""
+    settings = config['analysis']
+    try:
+        analysis = (await client.chat(
+            settings['model'],
+            settings['persona'],
+            country_engine.build_analysis_prompt(config, trends_data, headlines),
+            settings['temperature'],
+            settings['max_tokens']
+        )).strip()
+    except Exception as e:
+        return country_engine.analysis_error(config, e)
+    if settings.get('language'):
+        try:
+            analysis = await client.translate(analysis, source='en', target=settings['language'])
+        except Exception as e:
+            print(f"Error translating analysis to {settings['language']}: {str(e)}")
+    return analysis
+
+async def fetch_trends_async(code, client, reuse_previous=True, run_id=None):
+    """Async version of country_engine.fetch_trends
+
+    Network stages run on the event loop; checkpoints, run fingerprint reuse,
+    the analysis log and the audio job queue are shared with the sync engine,
+    so both paths leave the same archive behind.
+
+    Returns the same {'headlines', 'trends_data', 'analysis'} dict, or None.
+    """
+    config = country_engine.get_country(code)
+    archive_code = config['code']
+    reuse_previous = reuse_previous and config.get('reuse_runs', True)
+    error_prefix = config['analysis']['error_prefix']
+    if not country_engine.validate_api_keys(config):
+        return None
+    checkpoint = await asyncio.to_thread(
+        checkpoints.RunCheckpoint, archive_code, country_engine.pipeline_name(config), run_id
+    )
+    timestamp = checkpoint.run_id
+
+    headlines, all_trends_data = await asyncio.gather(
+        run_stage(checkpoint, 'headlines', lambda: fetch_headlines(client, config)),
+        run_stage(checkpoint, 'trends', lambda: fetch_trending(client, config))
+    )
+    print(f"[{code}] {len(headlines)} headlines, {len(all_trends_data)} trending searches")
+    if not (all_trends_data and headlines):
+        print(f"[{code}] Not enough data to compare headlines with trends")
+        await asyncio.to_thread(checkpoint.finish, 'no_data')
+        return None
+
+    # Skip the LLM and TTS when the inputs match the latest run
+    fingerprint = run_fingerprint.build_fingerprint(headlines, all_trends_data)
+    previous = await asyncio.to_thread(run_fingerprint.find_reusable_run, archive_code, fingerprint) if reuse_previous else None
+    if previous:
+        await asyncio.to_thread(country_engine.reused_audio, config, previous)
+        await asyncio.to_thread(checkpoint.complete, reused_run=previous['timestamp'])
+        return {
+            'headlines': previous['headlines'],
+            'trends_data': previous['trends_data'],
+            'analysis': previous['analysis']
+        }
+
+    async def select_trends():
+        surprising_indices = country_engine.find_surprising_trends(config, all_trends_data, headlines)
+        selected = [all_trends_data[i] for i in surprising_indices]
+        selected_headlines = headlines
+        if config['translate_from']:
+            selected_headlines, selected = await translate_run(client, config, headlines, selected)
+        return {'headlines': selected_headlines, 'trends_data': selected}
+
+    selection = await run_stage(checkpoint, 'selection', select_trends)
+    headlines, trends_data = selection['headlines'], selection['trends_data']
+
+    analysis = await run_stage(
+        checkpoint, 'analysis',
+        lambda: generate_analysis(client, config, trends_data, headlines),
+        is_valid=lambda text: not text.startswith(error_prefix)
+    )
+    analysis_ok = not analysis.startswith(error_prefix)
+
+    log_saved = await asyncio.to_thread(
+        checkpoint.run, 'log',
+        lambda: country_engine.save_analysis_log(config, headlines, trends_data, analysis, timestamp),
+        lambda saved: saved and analysis_ok
+    )
+    if log_saved and analysis_ok:
+        cloud_upload.upload_log(archive_code, timestamp, country_engine.get_log_path(config, timestamp))
+        # TTS is shared with the sync engine (segmenting, streaming to disk, content cache):
+        # queued for the audio workers, or run in a worker thread when AUDIO_BACKGROUND=0
+        audio = await asyncio.to_thread(
+            checkpoint.run, 'audio',
+            lambda: country_engine.start_run_audio(config, analysis, timestamp),
+            bool,
+            audio_jobs.audio_ready_or_queued
+        )
+        if audio:
+            if config.get('reuse_runs', True):
+                await asyncio.to_thread(run_fingerprint.save_latest, archive_code, fingerprint, timestamp, audio)
+            await asyncio.to_thread(checkpoint.complete)
+    elif log_saved:
+        print(f"[{code}] Skipping audio generation because the analysis failed")
+    else:
+        print(f"[{code}] Skipping audio generation due to JSON save failure")
+
+    return {
+        'headlines': headlines,
+        'trends_data': trends_data,
+        'analysis': analysis
+    }
+
+async def fetch_many_async(codes):
+    """Run several countries on one event loop with one shared client"""
+    async with AsyncProviderClient() as client:
+        return await asyncio.gather(*(fetch_trends_async(code, client) for code in codes), return_exceptions=True)
+
+if __name__ == "__main__":
+    requested = [arg.upper() for arg in sys.argv[1:]] or [code for code, config in ASYNC_COUNTRIES.items() if config.get('run_by_default', True)]
+    if any(code not in ASYNC_COUNTRIES for code in requested):
+        print("\nUsage: python async_providers.py [COUNTRY_CODE ...]")
+        print(f"\nAvailable codes: {', '.join(ASYNC_COUNTRIES)}")
+    else:
+        for code, result in zip(requested, asyncio.run(fetch_many_async(requested))):
+            if isinstance(result, Exception):
+                print(f"{code}: error - {str(result)}")
+            else:
+                print(f"{code}: {'ok' if result else 'no data'}")
@@ -0,0 +1,27 @@
+import os
+import json
+import tempfile
+
+def write_json(path, data):
+    """Write data to path as JSON using atomic write
+
+    The JSON goes to a temporary file in the same directory, is flushed to disk
+    and renamed over path, so readers never see a half-written file. Missing
+    directories are created. Errors are raised to the caller, which reports them.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temp_file = tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8', dir=directory, suffix='.tmp')
+    try:
+        json.dump(data, temp_file, ensure_ascii=False, indent=2)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+        temp_file.close()
+        os.replace(temp_file.name, path)
+    finally:
+        temp_file.close()
+        if os.path.exists(temp_file.name):
+            try:
+                os.unlink(temp_file.name)
+            except Exception as e:
+                print(f"Error cleaning up temporary file: {str(e)}")
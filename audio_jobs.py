@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import sqlite3
+import importlib
+import threading
+from datetime import datetime
+
+# Persistent queue of text-to-speech jobs, so runs can return as soon as the
+# analysis log is saved. Set AUDIO_BACKGROUND=0 to generate audio inline.
+AUDIO_BACKGROUND = os.getenv('AUDIO_BACKGROUND', '1') != '0'
+AUDIO_JOBS_PATH = os.getenv('AUDIO_JOBS_PATH', os.path.join('archive', 'jobs', 'audio_jobs.sqlite3'))
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', '2'))
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30
+POLL_INTERVAL = 5
+STALE_AFTER_SECONDS = 15 * 60  # running jobs not updated for this long are assumed dead
+
+_local = threading.local()
+_workers = []
+_workers_lock = threading.Lock()
+
+def _connect():
+    """Per-thread connection to the jobs database"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        directory = os.path.dirname(AUDIO_JOBS_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(AUDIO_JOBS_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                module TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                text TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                UNIQUE (module, timestamp)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, next_attempt_at)")
+        _local.conn = conn
+    return conn
+
+def module_name(module_file):
+    """Importable module name for a pipeline file (works when it runs as __main__)"""
+    return os.path.splitext(os.path.basename(module_file))[0]
+
+def enqueue(module_file, text, timestamp):
+    """Queue audio generation for a saved analysis and make sure workers are running
+
+    Args:
+        module_file: __file__ of the pipeline module whose generate_audio(text, timestamp) to call,
+            or a 'module:key' pipeline name (see country_engine.pipeline_name)
+        text: Analysis text
+        timestamp: Run timestamp shared with the analysis log
+
+    Returns the job id, or None if the job could not be queued.
+    """
+    try:
+        now = time.time()
+        conn = _connect()
+        conn.execute(
+            """
+            INSERT INTO jobs (module, timestamp, text, status, created_at, updated_at, next_attempt_at)
+            VALUES (?, ?, ?, 'queued', ?, ?, ?)
+            ON CONFLICT (module, timestamp) DO UPDATE SET
+                text = excluded.text, status = 'queued', attempts = 0, last_error = NULL,
+                updated_at = excluded.updated_at, next_attempt_at = excluded.next_attempt_at
+            """,
+            (module_name(module_file), timestamp, text, now, now, now)
+        )
+        job_id = get_job_id(module_name(module_file), timestamp)
+        print(f"Audio queued as job {job_id}")
+    except Exception as e:
+        print(f"Error queuing audio job: {str(e)}")
+        return None
+    ensure_workers()
+    return job_id
+
+def start_audio(module_file, generate_audio, text, timestamp, audio_file):
+    """Queue a run's audio, or generate it inline when the queue is off or unavailable
+
+    Returns {'audio_file', 'job_id'} (job_id is None for inline audio), or None
+    if inline generation failed.
+    """
+    job_id = enqueue(module_file, text, timestamp) if AUDIO_BACKGROUND else None
+    if job_id is None and not generate_audio(text, timestamp):
+        return None
+    return {'audio_file': audio_file, 'job_id': job_id}
+
+def audio_ready_or_queued(started):
+    """Whether audio from start_audio exists or its job is still on its way"""
+    if not started:
+        return False
+    if os.path.exists(started['audio_file']):
+        return True
+    job = get_job(started['job_id']) if started.get('job_id') else None
+    return job is not None and job['status'] in ('queued', 'running')
+
+def get_job_id(module, timestamp):
+    """Id of the job for a module run"""
+    row = _connect().execute("SELECT id FROM jobs WHERE module = ? AND timestamp = ?", (module, timestamp)).fetchone()
+    return row['id'] if row else None
+
+def get_job(job_id):
+    """Job row as a dict, or None"""
+    row = _connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def list_jobs(status=None, limit=50):
+    """Most recent jobs, optionally filtered by status"""
+    conn = _connect()
+    if status:
+        rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+def claim_next():
+    """Atomically mark the next due job as running and return it, or None"""
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Jobs whose worker died mid-run go back to the queue
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?",
+            (now - STALE_AFTER_SECONDS,)
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (now, row['id'])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    job = dict(row)
+    job['attempts'] += 1
+    return job
+
+def next_due_in():
+    """Seconds until the next queued job is due, None if nothing is queued"""
+    row = _connect().execute("SELECT MIN(next_attempt_at) AS due FROM jobs WHERE status = 'queued'").fetchone()
+    if row['due'] is None:
+        return None
+    return max(0.0, row['due'] - time.time())
+
+def mark_done(job_id):
+    """Record a successful job"""
+    _connect().execute(
+        "UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+        (time.time(), job_id)
+    )
+
+def mark_failed(job, error):
+    """Schedule a retry with exponential backoff, or give up after MAX_ATTEMPTS"""
+    now = time.time()
+    if job['attempts'] < MAX_ATTEMPTS:
+        delay = RETRY_BASE_SECONDS * (2 ** (job['attempts'] - 1))
+        print(f"Audio job {job['id']} failed ({error}), retrying in {delay}s")
+        _connect().execute(
+            "UPDATE jobs SET status = 'queued', last_error = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+            (error, now, now + delay, job['id'])
+        )
+    else:
+        print(f"Audio job {job['id']} failed after {job['attempts']} attempts: {error}")
+        _connect().execute(
+            "UPDATE jobs SET status = 'failed', last_error = ?, updated_at = ? WHERE id = ?",
+            (error, now, job['id'])
+        )
+
+def retry(job_id):
+    """Put a failed job back in the queue"""
+    _connect().execute(
+        "UPDATE jobs SET status = 'queued', attempts = 0, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+        (time.time(), time.time(), job_id)
+    )
+    ensure_workers()
+
+def run_job(job):
+    """Generate the audio for a job with its pipeline's generate_audio
+
+    Jobs of config-only pipelines are queued as 'module:key' and call
+    module.generate_audio(key, text, timestamp).
+    """
+    try:
+        module_name, _, key = job['module'].partition(':')
+        module = importlib.import_module(module_name)
+        if module.generate_audio(*([key] if key else []), job['text'], job['timestamp']):
+            mark_done(job['id'])
+            return True
+        mark_failed(job, "generate_audio returned False")
+    except Exception as e:
+        mark_failed(job, str(e))
+    return False
+
+def work(stop_when_idle=True):
+    """Process jobs until the queue is empty (or forever if stop_when_idle is False)"""
+    while True:
+        try:
+            job = claim_next()
+        except Exception as e:
+            print(f"Error claiming audio job: {str(e)}")
+            job = None
+        if job:
+            print(f"Generating audio for job {job['id']} ({job['module']} {job['timestamp']}, attempt {job['attempts']})")
+            run_job(job)
+            continue
+
+        due_in = next_due_in()
+        if due_in is None and stop_when_idle:
+            return
+        time.sleep(min(POLL_INTERVAL, due_in) if due_in is not None else POLL_INTERVAL)
+
+def ensure_workers(count=None):
+    """Start in-process workers if none are running
+
+    Workers are regular (non-daemon) threads that exit once the queue is empty,
+    so a command-line run waits for its audio before the process exits.
+    """
+    count = count or AUDIO_WORKERS
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        for i in range(len(_workers), count):
+            worker = threading.Thread(target=work, name=f"audio-worker-{i}")
+            worker.start()
+            _workers.append(worker)
+
+def print_jobs(jobs):
+    """Print a job table"""
+    for job in jobs:
+        updated = datetime.fromtimestamp(job['updated_at']).strftime("%Y-%m-%d %H:%M:%S")
+        line = f"{job['id']:>5} {job['status']:<8} {job['module']:<16} {job['timestamp']}  attempts={job['attempts']}  {updated}"
+        if job['last_error']:
+            line += f"  {job['last_error']}"
+        print(line)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'worker':
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else AUDIO_WORKERS
+        print(f"Starting {count} audio workers (Ctrl+C to stop)")
+        threads = [threading.Thread(target=work, args=(False,), daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    elif command == 'status':
+        print_jobs(list_jobs(sys.argv[2] if len(sys.argv) > 2 else None))
+    elif command == 'retry' and len(sys.argv) > 2:
+        retry(int(sys.argv[2]))
+    else:
+        print("\nUsage: python audio_jobs.py worker [COUNT]   - process audio jobs continuously")
+        print("       python audio_jobs.py status [STATUS]  - list recent jobs (queued, running, done, failed)")
+        print("       python audio_jobs.py retry JOB_ID     - requeue a failed job and run it")
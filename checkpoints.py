@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import importlib
+import threading
+from datetime import datetime
+import atomic_file
+import audio_jobs
+
+# One JSON file per run with the output of every finished stage, so a run that
+# failed part way can be resumed without paying for the stages that succeeded.
+CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', os.path.join('archive', 'checkpoints'))
+CHECKPOINT_KEEP_DAYS = int(os.getenv('CHECKPOINT_KEEP_DAYS', '7'))
+# Runs with these statuses are never resumed: 'no_data' runs found no headlines or trends
+FINISHED_STATUSES = ('complete', 'no_data')
+
+class RunCheckpoint:
+    def __init__(self, code, pipeline, run_id=None):
+        """Stage outputs of one pipeline run, saved after every stage
+
+        Args:
+            code: Country code (archive directory name)
+            pipeline: Pipeline name the resume command calls back into, a module name
+                or 'module:key' (see country_engine.pipeline_name)
+            run_id: Existing run to resume; a new run ID (its timestamp) is created if omitted
+        """
+        self.code = code
+        self._lock = threading.Lock()
+        if run_id:
+            self.run_id = run_id
+            self.path = os.path.join(CHECKPOINT_DIR, code, f"{run_id}.json")
+            self.data = self._load()
+            if self.data is None:
+                print(f"No checkpoint found for {code} run {run_id}, starting it from scratch")
+        else:
+            self.run_id, self.path = self._reserve_run_id(code)
+            self.data = None
+        if self.data is None:
+            self.data = {
+                'run_id': self.run_id,
+                'code': code,
+                'module': pipeline,
+                'status': 'running',
+                'created_at': time.time(),
+                'stages': {},
+                'errors': {}
+            }
+            prune(code)
+            with self._lock:
+                self._write()
+
+    @staticmethod
+    def _reserve_run_id(code):
+        """Claim a new run ID for code by creating its checkpoint file
+
+        Run IDs are second-resolution timestamps, so two runs of the same archive
+        starting in the same second wait for the next one instead of sharing files.
+        """
+        directory = os.path.join(CHECKPOINT_DIR, code)
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(directory, f"{run_id}.json")
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return run_id, path
+            except FileExistsError:
+                time.sleep(0.2)
+
+    def _load(self):
+        """Read the checkpoint file, None if missing or unreadable"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading checkpoint {self.path}: {str(e)}")
+            return None
+
+    def _write(self):
+        """Save the checkpoint using atomic write (caller holds the lock)"""
+        try:
+            self.data['updated_at'] = time.time()
+            atomic_file.write_json(self.path, self.data)
+        except Exception as e:
+            print(f"Error saving checkpoint: {str(e)}")
+
+    def get(self, stage):
+        """Saved output of a stage, or None"""
+        entry = self.data['stages'].get(stage)
+        return entry['data'] if entry else None
+
+    def save(self, stage, data):
+        """Record a stage's output"""
+        with self._lock:
+            self.data['stages'][stage] = {'data': data, 'at': time.time()}
+            self.data['errors'].pop(stage, None)
+            self._write()
+
+    def fail(self, stage, error):
+        """Record why a stage failed"""
+        with self._lock:
+            self.data['errors'][stage] = error
+            self.data['status'] = 'incomplete'
+            self._write()
+
+    def finish(self, status, **details):
+        """Mark the run as finished with one of FINISHED_STATUSES"""
+        with self._lock:
+            self.data['status'] = status
+            self.data.update(details)
+            self._write()
+
+    def complete(self, **details):
+        """Mark the run as finished successfully"""
+        self.finish('complete', **details)
+
+    def run(self, stage, compute, is_valid=bool, is_complete=None):
+        """Return a stage's saved output, or compute and save it
+
+        Args:
+            stage: Stage name
+            compute: Callable producing the stage output
+            is_valid: Whether a computed output counts as success (failed outputs are not saved)
+            is_complete: Whether a saved output can still be used (e.g. its file still exists)
+        """
+        entry = self.data['stages'].get(stage)
+        if entry and (is_complete is None or is_complete(entry['data'])):
+            print(f"Using saved {stage} from run {self.run_id}")
+            return entry['data']
+        try:
+            result = compute()
+        except Exception as e:
+            self.fail(stage, str(e))
+            raise
+        if is_valid(result):
+            self.save(stage, result)
+        else:
+            self.fail(stage, f"{stage} stage produced no usable result")
+        return result
+
+def list_runs(code=None, status=None):
+    """Saved runs, newest first, optionally filtered by country and status"""
+    runs = []
+    codes = [code] if code else (sorted(os.listdir(CHECKPOINT_DIR)) if os.path.isdir(CHECKPOINT_DIR) else [])
+    for country in codes:
+        directory = os.path.join(CHECKPOINT_DIR, country)
+        if not os.path.isdir(directory):
+            continue
+        for file in os.listdir(directory):
+            if not file.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, file), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error reading checkpoint {file}: {str(e)}")
+                continue
+            if status is None or data.get('status') == status:
+                runs.append(data)
+    runs.sort(key=lambda run: run['run_id'], reverse=True)
+    return runs
+
+def prune(code):
+    """Delete checkpoints older than CHECKPOINT_KEEP_DAYS, finished or not"""
+    directory = os.path.join(CHECKPOINT_DIR, code)
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - CHECKPOINT_KEEP_DAYS * 24 * 3600
+    for file in os.listdir(directory):
+        path = os.path.join(directory, file)
+        try:
+            if file.endswith('.json') and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except Exception as e:
+            print(f"Error pruning checkpoint {file}: {str(e)}")
+
+def needs_resume(run):
+    """Whether a run is unfinished, or finished but its audio is missing and no longer queued
+
+    With the background audio queue a run completes once its audio job is
+    queued, so a job that later fails for good is only visible here.
+    """
+    if run.get('status') not in FINISHED_STATUSES:
+        return True
+    audio = run['stages'].get('audio')
+    return audio is not None and not audio_jobs.audio_ready_or_queued(audio['data'])
+
+def resume(code, run_id=None):
+    """Re-run only the missing or failed stages of a run (the latest unfinished one by default)"""
+    if run_id is None:
+        unfinished = [run for run in list_runs(code) if needs_resume(run)]
+        if not unfinished:
+            print(f"No unfinished runs for {code}")
+            return None
+        run_id = unfinished[0]['run_id']
+    runs = [run for run in list_runs(code) if run['run_id'] == run_id]
+    if not runs:
+        print(f"No checkpoint found for {code} run {run_id}")
+        return None
+    print(f"Resuming {code} run {run_id}")
+    # Config-only pipelines are recorded as 'module:key' (see country_engine.pipeline_name)
+    module_name, _, key = runs[0]['module'].partition(':')
+    module = importlib.import_module(module_name)
+    return module.fetch_trends(*([key] if key else []), run_id=run_id, reuse_previous=False)
+
+def print_runs(runs):
+    """Print a table of runs with their finished and failed stages"""
+    for run in runs:
+        line = f"{run['code']:<4} {run['run_id']}  {run['status']:<10} done: {', '.join(run['stages']) or '-'}"
+        if run.get('errors'):
+            line += f"  failed: {', '.join(run['errors'])}"
+        if run['status'] in FINISHED_STATUSES and needs_resume(run):
+            line += "  audio missing"
+        print(line)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'list':
+        print_runs(list_runs(sys.argv[2].upper() if len(sys.argv) > 2 else None))
+    elif command == 'resume' and len(sys.argv) > 2:
+        resume(sys.argv[2].upper(), sys.argv[3] if len(sys.argv) > 3 else None)
+    else:
+        print("\nUsage: python checkpoints.py list [COUNTRY_CODE]")
+        print("       python checkpoints.py resume COUNTRY_CODE [RUN_ID]")
+        print("\nResume re-executes only the failed or missing stages (latest unfinished run by default);")
+        print("runs whose audio job failed are resumed to generate their audio")
@@ -1,11 +1,47 @@
 from google.cloud import storage
 from google.oauth2 import service_account
+from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
 import streamlit as st
 import os
+import sys
 import json
+import time
 import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Signed audio URLs are shared by every viewer session in the process and
+# replaced this many seconds before they expire
+SIGNED_URL_EXPIRATION = 3600
+SIGNED_URL_REFRESH_MARGIN = 300
+# Missing audio is looked up again after this many seconds
+MISSING_AUDIO_TTL = 60
+
+_signed_urls = {}
+_signed_urls_lock = threading.Lock()
+
+# Index of the archive kept in the bucket: {'dates': {YYYYMMDD: {'json', 'timestamp', 'audio'}}}.
+# Writers update it with generation preconditions; readers revalidate their copy by ETag.
+MANIFEST_BLOB = "index/IL2_manifest.json"
+MANIFEST_UPDATE_ATTEMPTS = 5
+# Seconds a fetched manifest is used before it is revalidated
+MANIFEST_CHECK_SECONDS = 15
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+# Parsed analyses shared by every viewer session, least recently used evicted first
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', '64'))
+# Dates on each side of the selected one loaded in the background
+PREFETCH_NEIGHBORS = 1
+
+_analyses = OrderedDict()
+_analyses_lock = threading.Lock()
+_prefetching = set()
+_prefetch_executor = None
+
 class CloudStorage:
     def __init__(self, bucket_name="israel-trends-archive", storage_client=None):
         """Initialize Google Cloud Storage client
@@ -70,6 +106,8 @@ class CloudStorage:
             json_blob = self.bucket.blob(f"text_archive/IL2/IL2_{date}_log.json")
             json_blob.upload_from_filename(json_path)
             print(f"JSON file uploaded to: {json_blob.name}")
+            # A day's entry is replaced by its latest run, so audio of an earlier run is dropped
+            entry = {'json': json_blob.name, 'timestamp': timestamp, 'audio': None}
             
             # Upload audio file if provided
             if audio_path and os.path.exists(audio_path):
@@ -77,49 +115,142 @@ class CloudStorage:
                 audio_blob = self.bucket.blob(f"audio/IL2/IL2_{timestamp}_analysis.mp3")
                 audio_blob.upload_from_filename(audio_path)
                 print(f"Audio file uploaded to: {audio_blob.name}")
+                entry['audio'] = audio_blob.name
+                self.update_manifest({date: entry})
                 return True
             else:
                 if not audio_path:
                     print("No audio path provided")
                 elif not os.path.exists(audio_path):
                     print(f"Audio file not found at: {audio_path}")
+                self.update_manifest({date: entry})
                 return False
         except Exception as e:
             print(f"Error uploading files: {str(e)}")
             return False
 
+    def _download_manifest(self, etag=None):
+        """Download the manifest; returns (data, etag, generation)
+
+        With etag, raises NotModified if the bucket copy has not changed.
+        A missing manifest is returned as (None, None, 0).
+        """
+        blob = self.bucket.blob(MANIFEST_BLOB)
+        try:
+            content = blob.download_as_bytes(if_etag_not_match=etag) if etag else blob.download_as_bytes()
+        except NotFound:
+            return None, None, 0
+        return json.loads(content), blob.etag, int(blob.generation)
+
+    def update_manifest(self, entries, condition=None):
+        """Merge date entries into the manifest without losing concurrent updates
+
+        Each write is conditional on the generation that was read, so a writer
+        that raced another one re-reads the manifest and tries again.
+
+        Args:
+            entries: {YYYYMMDD: {'json', 'timestamp', 'audio'}}; keys of existing dates are overwritten
+            condition: Optional callable (date, current_entry) returning False to leave a date
+                unchanged; it sees the manifest read on each attempt, so it is re-checked after a conflict
+
+        Returns True if the manifest was written or no date passed the condition.
+        """
+        for attempt in range(MANIFEST_UPDATE_ATTEMPTS):
+            try:
+                data, _, generation = self._download_manifest()
+                data = data or {'dates': {}}
+                accepted = {
+                    date: entry for date, entry in entries.items()
+                    if condition is None or condition(date, data['dates'].get(date, {}))
+                }
+                if not accepted:
+                    print("Manifest already has newer entries, nothing to update")
+                    return True
+                for date, entry in accepted.items():
+                    data['dates'].setdefault(date, {}).update(entry)
+                data['updated_at'] = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.bucket.blob(MANIFEST_BLOB).upload_from_string(
+                    json.dumps(data, ensure_ascii=False, sort_keys=True),
+                    content_type='application/json',
+                    if_generation_match=generation
+                )
+                # This process's copy is stale now
+                with _manifests_lock:
+                    _manifests.pop(self.bucket_name, None)
+                print(f"Manifest updated with {len(accepted)} dates")
+                return True
+            except PreconditionFailed:
+                print(f"Manifest changed while updating it, retrying ({attempt + 1}/{MANIFEST_UPDATE_ATTEMPTS})")
+            except Exception as e:
+                print(f"Error updating manifest: {str(e)}")
+                return False
+        print("Giving up on manifest update after repeated conflicts")
+        return False
+
+    def get_manifest(self):
+        """Fetch the manifest, reusing the local copy while its ETag still matches
+
+        The copy is shared by every session in the process and revalidated at
+        most every MANIFEST_CHECK_SECONDS. Returns None if the bucket has no manifest.
+        """
+        with _manifests_lock:
+            cached = _manifests.get(self.bucket_name)
+        if cached and time.time() - cached['checked_at'] < MANIFEST_CHECK_SECONDS:
+            return cached['data']
+        try:
+            data, etag, _ = self._download_manifest(cached['etag'] if cached else None)
+        except NotModified:
+            data, etag = cached['data'], cached['etag']
+        except Exception as e:
+            print(f"Error fetching manifest: {str(e)}")
+            return cached['data'] if cached else None
+        with _manifests_lock:
+            _manifests[self.bucket_name] = {'data': data, 'etag': etag, 'checked_at': time.time()}
+        return data
+
+    def list_archive(self):
+        """Manifest entries built from a full listing of the archive"""
+        entries = {}
+        for blob in self.storage_client.list_blobs(self.bucket_name, prefix="text_archive/IL2/"):
+            # text_archive/IL2/IL2_20250126_log.json
+            parts = blob.name.split('/')[-1].split('_')
+            if len(parts) >= 3 and parts[1].isdigit():
+                entries.setdefault(parts[1], {})['json'] = blob.name
+        for blob in self.storage_client.list_blobs(self.bucket_name, prefix="audio/IL2/"):
+            # audio/IL2/IL2_20250126_173220_analysis.mp3; the latest audio of a day wins
+            parts = blob.name.split('/')[-1].split('_')
+            if len(parts) >= 4 and parts[1] in entries:
+                timestamp = f"{parts[1]}_{parts[2]}"
+                if timestamp >= entries[parts[1]].get('timestamp', ''):
+                    entries[parts[1]].update({'timestamp': timestamp, 'audio': blob.name})
+        print(f"Found {len(entries)} dates in the archive")
+        return entries
+
+    def rebuild_manifest(self):
+        """Build the manifest from a full listing of the archive (one-off migration)"""
+        entries = self.list_archive()
+        return self.update_manifest(entries) if entries else False
+
     def get_available_dates(self):
-        """Get list of available analysis dates"""
+        """Get list of available analysis dates, newest first, from the manifest"""
         try:
-            print(f"Listing blobs in bucket: {self.bucket_name}")
-            print(f"Using prefix: text_archive/IL2/")
-            
-            # List all JSON files in text_archive
-            blobs = self.storage_client.list_blobs(
-                self.bucket_name, 
-                prefix="text_archive/IL2/"
-            )
-            
+            manifest = self.get_manifest()
+            if manifest is None:
+                # Viewers with read-only access fall back to the listing until a writer builds it
+                print("No manifest in bucket yet, building it from the archive listing")
+                manifest = {'dates': self.list_archive()}
+                if manifest['dates']:
+                    self.update_manifest(manifest['dates'])
+
             dates = []
-            blob_list = list(blobs)  # Convert iterator to list
-            print(f"Found {len(blob_list)} blobs")
-            
-            for blob in blob_list:
-                print(f"Processing blob: {blob.name}")
-                # Extract date from filename (format: text_archive/IL2/IL2_20250126_152118_log.json)
-                parts = blob.name.split('/')[-1].split('_')  # Get last part of path and split
-                if len(parts) >= 2:
-                    date_str = parts[1]
+            for date_str in manifest['dates']:
                 try:
-                    date = datetime.strptime(date_str, '%Y%m%d')
-                    dates.append(date)
-                    print(f"Added date: {date}")
+                    dates.append(datetime.strptime(date_str, '%Y%m%d'))
                 except ValueError as ve:
-                    print(f"Invalid date format in blob: {blob.name}, error: {str(ve)}")
-                    continue
+                    print(f"Invalid date in manifest: {date_str}, error: {str(ve)}")
             
             # Sort dates in reverse chronological order
-            sorted_dates = sorted(set(dates), reverse=True)
+            sorted_dates = sorted(dates, reverse=True)
             print(f"Returning {len(sorted_dates)} unique dates")
             return sorted_dates
             
@@ -130,38 +261,23 @@ class CloudStorage:
             print(f"Traceback: {traceback.format_exc()}")
             return []
 
-    def load_analysis(self, date_str):
+    def load_analysis(self, date_str, prefetch=True):
         """Load analysis data for a specific date
         
+        The blob is resolved from the manifest and parsed analyses are kept in
+        a shared LRU. Neighboring dates are loaded in the background so stepping
+        through the archive does not wait on the bucket.
+
         Args:
             date_str: Date string in YYYYMMDD format
+            prefetch: Also load the adjacent dates in the background
         """
         try:
-            print(f"Loading analysis for date: {date_str}")
-            
-            # Find matching JSON file
-            prefix = f"text_archive/IL2/IL2_{date_str}"
-            print(f"Looking for files with prefix: {prefix}")
-            
-            blobs = self.storage_client.list_blobs(
-                self.bucket_name,
-                prefix=prefix
-            )
-            
-            matching_blobs = list(blobs)
-            print(f"Found {len(matching_blobs)} matching blobs")
-            
-            if not matching_blobs:
-                return None
-                
-            # Download and parse JSON
-            blob = matching_blobs[0]
-            print(f"Using blob: {blob.name}")
-            
-            json_str = blob.download_as_string()
-            data = json.loads(json_str)
-            print(f"Loaded data with timestamp: {data.get('timestamp')}")
-            
+            manifest = self.get_manifest() or {'dates': {}}
+            entry = manifest['dates'].get(date_str)
+            data = self._load_entry(date_str, entry)
+            if prefetch and entry:
+                self._prefetch_neighbors(date_str, manifest)
             return data
             
         except Exception as e:
@@ -171,37 +287,91 @@ class CloudStorage:
             print(f"Traceback: {traceback.format_exc()}")
             return None
 
+    def _load_entry(self, date_str, entry):
+        """Parsed analysis for a manifest entry, from the LRU or the bucket"""
+        if not entry:
+            # Dates missing from the manifest are looked up by prefix
+            print(f"{date_str} not in manifest, looking for files with prefix: text_archive/IL2/IL2_{date_str}")
+            matching_blobs = list(self.storage_client.list_blobs(self.bucket_name, prefix=f"text_archive/IL2/IL2_{date_str}"))
+            if not matching_blobs:
+                return None
+            return json.loads(matching_blobs[0].download_as_bytes())
+
+        # The day's JSON blob is overwritten by later runs, so the timestamp is part of the key
+        cache_key = (self.bucket_name, entry['json'], entry.get('timestamp'))
+        with _analyses_lock:
+            if cache_key in _analyses:
+                _analyses.move_to_end(cache_key)
+                return _analyses[cache_key]
+
+        data = json.loads(self.bucket.blob(entry['json']).download_as_bytes())
+        print(f"Loaded {entry['json']} with timestamp: {data.get('timestamp')}")
+        with _analyses_lock:
+            _analyses[cache_key] = data
+            while len(_analyses) > ANALYSIS_CACHE_SIZE:
+                _analyses.popitem(last=False)
+        return data
+
+    def _prefetch_neighbors(self, date_str, manifest):
+        """Load the dates next to date_str in the background"""
+        global _prefetch_executor
+        dates = sorted(manifest['dates'])
+        position = dates.index(date_str)
+        neighbors = dates[max(0, position - PREFETCH_NEIGHBORS):position] + dates[position + 1:position + 1 + PREFETCH_NEIGHBORS]
+        for neighbor in neighbors:
+            entry = manifest['dates'][neighbor]
+            cache_key = (self.bucket_name, entry['json'], entry.get('timestamp'))
+            with _analyses_lock:
+                if cache_key in _analyses or cache_key in _prefetching:
+                    continue
+                _prefetching.add(cache_key)
+                if _prefetch_executor is None:
+                    _prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+            _prefetch_executor.submit(self._prefetch, neighbor, entry, cache_key)
+
+    def _prefetch(self, date_str, entry, cache_key):
+        try:
+            self._load_entry(date_str, entry)
+        except Exception as e:
+            print(f"Error prefetching {date_str}: {str(e)}")
+        finally:
+            with _analyses_lock:
+                _prefetching.discard(cache_key)
+
     def get_audio_url(self, timestamp):
         """Get signed URL for audio file
-        
+
+        Signed URLs are cached per blob and reused until shortly before they
+        expire, so reruns of the viewer make no bucket requests.
+
         Args:
             timestamp: Timestamp string from analysis data
         """
         try:
-            # List all audio files to debug
-            print("Listing all blobs in bucket:")
-            all_blobs = list(self.storage_client.list_blobs(self.bucket_name))
-            for b in all_blobs:
-                print(f"Found blob: {b.name}")
-            
-            # Try to find the audio file
             audio_path = f"audio/IL2/IL2_{timestamp}_analysis.mp3"
-            print(f"Looking for audio file: {audio_path}")
-            
-            blob = self.bucket.blob(audio_path)
-            exists = blob.exists()
-            print(f"Audio file exists: {exists}")
-            
-            if not exists:
+            cache_key = (self.bucket_name, audio_path)
+            now = time.time()
+            with _signed_urls_lock:
+                cached = _signed_urls.get(cache_key)
+            if cached and cached[1] > now:
+                return cached[0]
+
+            # Direct metadata lookup of the one blob; None if it does not exist
+            blob = self.bucket.get_blob(audio_path)
+            if blob is None:
+                print(f"Audio file not found: {audio_path}")
+                with _signed_urls_lock:
+                    _signed_urls[cache_key] = (None, now + MISSING_AUDIO_TTL)
                 return None
-                
-            # Generate signed URL that expires in 1 hour
+
             url = blob.generate_signed_url(
                 version="v4",
-                expiration=3600,  # 1 hour
+                expiration=SIGNED_URL_EXPIRATION,
                 method="GET"
             )
-            print(f"Generated signed URL: {url}")
+            with _signed_urls_lock:
+                _signed_urls[cache_key] = (url, now + SIGNED_URL_EXPIRATION - SIGNED_URL_REFRESH_MARGIN)
+            print(f"Generated signed URL for: {audio_path}")
             return url
             
         except Exception as e:
@@ -212,41 +382,14 @@ class CloudStorage:
             return None
 
 def upload_archive_to_cloud():
-    """Utility function to upload IL2 archive files to cloud storage"""
-    storage = CloudStorage()
-    
-    # Process IL2 files from text_archive and audio from IL2 directory
-    json_dir = os.path.join("archive", "text_archive", "IL2")
-    audio_dir = os.path.join("archive", "IL2")
-    
-    if not os.path.exists(json_dir):
-        print(f"IL2 text_archive directory not found at: {json_dir}")
-        return
-        
-    if not os.path.exists(audio_dir):
-        print(f"IL2 audio directory not found at: {audio_dir}")
-        return
-        
-    # Get all JSON files from text_archive/IL2
-    for file in os.listdir(json_dir):
-        if file.endswith("_log.json"):
-            # Upload JSON file
-            json_path = os.path.join(json_dir, file)
-            
-            # Find corresponding audio file
-            parts = file.split('_')  # IL2_20250126_173220_log.json
-            if len(parts) >= 3:
-                timestamp = f"{parts[1]}_{parts[2]}"  # 20250126_173220
-                audio_path = os.path.join(audio_dir, f"IL2_{timestamp}_analysis.mp3")
-                print(f"Looking for audio file at: {audio_path}")
-            
-            # Upload both JSON and audio files
-            if storage.upload_analysis(json_path, audio_path):
-                print(f"Uploaded JSON: {file}")
-                print(f"Uploaded Audio: {os.path.basename(audio_path)}")
-            else:
-                print(f"Failed to upload files for timestamp {timestamp}")
+    """Utility function to upload IL2 archive files to cloud storage (see archive_sync.py)"""
+    import archive_sync
+    return archive_sync.sync()
 
 if __name__ == "__main__":
-    # Run this to upload entire archive
-    upload_archive_to_cloud()
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild-manifest':
+        # Index an archive uploaded before the manifest existed
+        CloudStorage().rebuild_manifest()
+    else:
+        # Run this to upload entire archive
+        upload_archive_to_cloud()
@@ -0,0 +1,106 @@
+import os
+import time
+import queue
+import threading
+
+# Optional write-behind upload of new runs to the cloud bucket read by the
+# viewers. Runs queue their files and return; a worker thread uploads them
+# with retries. Enable with CLOUD_UPLOAD=1.
+CLOUD_UPLOAD = os.getenv('CLOUD_UPLOAD', '0') == '1'
+# Archives with a layout in the bucket (see cloud_storage.py)
+CLOUD_UPLOAD_CODES = set(os.getenv('CLOUD_UPLOAD_CODES', 'IL2').split(','))
+BUCKET_NAME = os.getenv('BUCKET_NAME', 'israel-trends-archive')
+
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 5
+# Seconds an idle worker waits for more uploads before it exits
+IDLE_SECONDS = 5
+
+_uploads = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_storage = None
+
+def enabled(code):
+    """Whether runs of an archive are uploaded as they are saved"""
+    return CLOUD_UPLOAD and code in CLOUD_UPLOAD_CODES
+
+def upload_log(code, timestamp, log_path):
+    """Queue a saved analysis log; returns immediately"""
+    if enabled(code):
+        _submit(('log', code, timestamp, log_path))
+
+def upload_audio(code, timestamp, audio_path):
+    """Queue a run's generated audio; returns immediately"""
+    if enabled(code):
+        _submit(('audio', code, timestamp, audio_path))
+
+def _submit(task):
+    global _worker
+    _uploads.put(task)
+    with _worker_lock:
+        # A regular (non-daemon) thread, so a command-line run finishes its uploads before exiting
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name="cloud-upload")
+            _worker.start()
+
+def get_storage():
+    """Shared CloudStorage, created on first upload"""
+    global _storage
+    if _storage is None:
+        from cloud_storage import CloudStorage
+        _storage = CloudStorage(bucket_name=BUCKET_NAME)
+    return _storage
+
+def upload(task):
+    """Upload one file and record it in the bucket manifest"""
+    kind, code, timestamp, path = task
+    storage = get_storage()
+    date = timestamp.split('_')[0]
+    if kind == 'log':
+        # One JSON per day; a new run replaces the day's entry, including its audio until that arrives
+        blob = storage.bucket.blob(f"text_archive/{code}/{code}_{date}_log.json")
+        blob.upload_from_filename(path, content_type='application/json')
+        entry = {'json': blob.name, 'timestamp': timestamp, 'audio': None}
+        condition = None
+    else:
+        blob = storage.bucket.blob(f"audio/{code}/{code}_{timestamp}_analysis.mp3")
+        blob.upload_from_filename(path, content_type='audio/mpeg')
+        entry = {'audio': blob.name}
+        # Audio is attached only while the day's JSON is from this run; a later run brings
+        # its own audio. Checked on every conditional write, so a run that lands meanwhile wins.
+        condition = lambda date, current: current.get('timestamp') == timestamp
+    if not storage.update_manifest({date: entry}, condition=condition):
+        raise RuntimeError("manifest update failed")
+    print(f"Uploaded {blob.name}")
+
+def _work():
+    """Upload queued files until the queue stays empty for IDLE_SECONDS"""
+    global _worker
+    while True:
+        try:
+            task = _uploads.get(timeout=IDLE_SECONDS)
+        except queue.Empty:
+            # Checked under the lock so a task submitted meanwhile either is seen
+            # here or finds no worker and starts a new one
+            with _worker_lock:
+                if _uploads.empty():
+                    _worker = None
+                    return
+            continue
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                upload(task)
+                break
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    print(f"Giving up on uploading {task[3]} after {attempt} attempts: {str(e)}")
+                else:
+                    delay = RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+                    print(f"Error uploading {task[3]} ({str(e)}), retrying in {delay}s")
+                    time.sleep(delay)
+        _uploads.task_done()
+
+def wait():
+    """Block until every queued upload has finished or given up"""
+    _uploads.join()
@@ -1,67 +1,29 @@
-import os
 import json
-import requests
 import warnings
 import textwrap
-from datetime import datetime, timedelta
-from deep_translator import GoogleTranslator
-from openai import OpenAI
-from newsapi import NewsApiClient
+from translation import translate
 from dotenv import load_dotenv
 import xml.etree.ElementTree as ET
+import provider_http
+import llm
+import country_engine
+import tts
 
 # Load environment variables
 load_dotenv()
 
-# Initialize clients
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-newsapi = NewsApiClient(api_key=os.getenv('NEWS_API_KEY'))
-
 # Suppress pandas warnings
 warnings.filterwarnings('ignore', category=FutureWarning)
 
-# News sources to filter out
-NEWS_SOURCES = {
-    'cnn', 'bbc', 'fox news', 'nyt', 'new york times',
-    'reuters', 'associated press', 'ap news'
-}
-
-JOURNALIST_PERSONA = """You're a journalist with the biting wit of Christopher Hitchens, tasked with analyzing the collective psyche through search trends. Your unique talent lies in using these digital footprints—what people search for in private—to expose the raw, unfiltered reality beneath official narratives.
-
-Your job is to decode these search patterns like a psychological X-ray, revealing the true preoccupations, fears, and absurdities that occupy people's minds while the state trumpets its grand narratives. Use dark humor and sharp insight to contrast the public face of events with the private thoughts revealed through search trends, showing how these digital confessions often tell a more honest story than any official report."""
+# Shared with the country pipelines, as are the OpenAI and NewsAPI clients
+NEWS_SOURCES = country_engine.NEWS_SOURCES
+JOURNALIST_PERSONA = country_engine.JOURNALIST_PERSONA
 
 def generate_audio(text):
     """Generate audio using ElevenLabs text-to-speech"""
     try:
-        url = "https://api.elevenlabs.io/v1/text-to-speech/TxGEqnHWrfWFTfGW9XjX"
-        
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": os.getenv('ELEVENLABS_API_KEY')
-        }
-        
-        data = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
-        
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            audio_file = "analysis.mp3"
-            with open(audio_file, "wb") as f:
-                f.write(response.content)
-            return True
-            
-        else:
-            print(f"Error: ElevenLabs API request failed with status code {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
+        audio_file = "analysis.mp3"
+        return tts.elevenlabs_tts(text, audio_file, "TxGEqnHWrfWFTfGW9XjX", "eleven_monolingual_v1")
             
     except Exception as e:
         print(f"Error with text-to-speech: {str(e)}")
@@ -89,9 +51,8 @@ def translate_text(text, lang_code):
         if all(ord(char) < 128 for char in text.replace(' ', '')):
             return text
             
-        translator = GoogleTranslator(source=lang_code, target='en')
         try:
-            result = translator.translate(text)
+            result = translate(text, source=lang_code, target='en')
             if result and result != text:
                 return result
         except Exception as e:
@@ -99,8 +60,7 @@ def translate_text(text, lang_code):
             pass
             
         print(f"Attempting auto-detection translation for: {text}")
-        translator = GoogleTranslator(source='auto', target='en')
-        result = translator.translate(text)
+        result = translate(text, source='auto', target='en')
         return result
     except Exception as e:
         print(f"Translation error for '{text}': {str(e)}")
@@ -120,7 +80,7 @@ def get_suggestions(keyword, lang_code):
         }
         
         print(f"Fetching suggestions for keyword: {keyword} with language: {lang_code}")
-        response = requests.get(url, params=params, headers=headers)
+        response = provider_http.get(url, params=params, headers=headers)
         if response.status_code == 200:
             data = json.loads(response.text)
             if len(data) > 1 and isinstance(data[1], list):
@@ -140,7 +100,7 @@ def get_trending_searches(country_code):
     try:
         url = f"https://trends.google.com/trending/rss?geo={country_code}"
         print(f"Fetching trends for country code: {country_code}")
-        response = requests.get(url)
+        response = provider_http.get(url)
         print(f"Trends API response status: {response.status_code}")
         
         if response.status_code == 200:
@@ -183,16 +143,7 @@ Write a brief, biting analysis (2 paragraphs) that:
 Keep it sharp and psychologically insightful, treating the search trends as a collective Rorschach test that reveals uncomfortable truths. Each paragraph should be a single continuous line."""
 
         print(f"Generating analysis for {country_name}")
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": JOURNALIST_PERSONA},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=500
-        )
-        return clean_text(response.choices[0].message.content)
+        return clean_text(llm.chat(country_engine.get_openai_client(), "gpt-4", JOURNALIST_PERSONA, prompt, temperature=0.8, max_tokens=500))
     except Exception as e:
         print(f"Error generating analysis: {str(e)}")
         return f"Error generating analysis: {str(e)}"
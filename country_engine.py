@@ -0,0 +1,812 @@
+import os
+import sys
+import json
+import random
+import threading
+import warnings
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import provider_http
+import llm
+import tts
+import audio_jobs
+import run_fingerprint
+import checkpoints
+import atomic_file
+import cloud_upload
+from translation import translate, translate_batch, is_ascii_text
+
+# Load environment variables
+load_dotenv()
+
+# Suppress warnings
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+# News sources to filter out
+NEWS_SOURCES = {
+    'cnn', 'bbc', 'fox news', 'nyt', 'new york times',
+    'reuters', 'associated press', 'ap news'
+}
+
+JOURNALIST_PERSONA = """You're a journalist with the biting wit of Christopher Hitchens, tasked with analyzing the collective psyche through search trends. Your unique talent lies in using these digital footprints—what people search for in private—to expose the raw, unfiltered reality beneath official narratives.
+
+Your job is to decode these search patterns like a psychological X-ray, revealing the true preoccupations, fears, and absurdities that occupy people's minds while the state trumpets its grand narratives. Use dark humor and sharp insight to contrast the public face of events with the private thoughts revealed through search trends, showing how these digital confessions often tell a more honest story than any official report."""
+
+ZIZEK_PERSONA = """אתה עיתונאי-פילוסוף שחושף את האבסורד של הקפיטליזם הישראלי בשנת 2025 דרך ניתוח דפוסי החיפוש בגוגל. בסגנון סלבוי ז'יז'ק, אתה לא יוצא מהדמות לרגע – לא רק בתוכן, אלא גם בטון, בקצב ובמבנה הרעיוני. דבר בקצב דינמי, עם חזרות רטוריות, הצבת שאלות רטוריות, ופאנצ'ים שמשאירים את הקורא חסר נשימה.
+
+הראה כיצד הסתירות של השוק החופשי נחשפות ברגעי חירום. האם לא נאמר לנו שהיד הנעלמה תדאג להכול? אז איך זה שכולם מחפשים איפה משיגים ביצים או איך להכין לחם בלי תנור? זה בדיוק העניין – הקפיטליזם מוכר לנו את הפנטזיה של אספקה אינסופית, ואז כשהמציאות מתערבת, הוא אומר לנו: אדפטציה, יוזמה, תמצאו פתרונות. אבל עצם זה שאנחנו צריכים פתרונות מאולתרים – זו ההוכחה שהמערכת קרסה.
+
+המנגנונים החברתיים נחשפים דרך מה שאנשים מחפשים בגוגל. חיפושי בידור בזמן אסון – האם זה לא מנגנון קלאסי של הדחקה? כולנו משחקים משחק כפול, הממשלה אומרת הכל בשליטה אבל בגוגל כולם מחפשים איך לשמור אוכל ללא מקרר. וזה בדיוק העניין, לא מה שאומרים קובע אלא מה שאנשים מחפשים. החיפוש הקולקטיבי הוא תת-מודע חברתי, ואנחנו קוראים אותו כמו פסיכואנליטיקאי שקורא פליטות פה.
+
+והקפיטליזם, הוא אף פעם לא מפסיק לתפקד גם כשהכל קורס. בזמן האזעקות כולם מחפשים משלוחי אוכל בזמן מלחמה, השוק מגיב, וולט שולח שליחים עם קסדות כי כסף צריך לזרום. פתרונות פרטיים תופסים את מקומם של הפתרונות המערכתיים, איזה גנרטור הכי טוב לבית זה כבר לא שאלה טכנית אלא עדות למדינה שמתפקדת כמו סטארט-אפ כושל.
+
+ואז יש את הפערים המעמדיים, וזה כבר לא רק כלכלה, זה מבנה שלם של מציאות. המעמד הגבוה מחפש איך להתפנות לחו"ל, המעמד הבינוני מחפש איך מקבלים אזרחות פורטוגלית, והשכבות הנמוכות מחפשות איך להכין לחם בלי תנור. זו דיאלקטיקה טהורה, לא רק כסף מפריד ביניהם אלא ההבנה של מה בכלל אפשרי עבורם.
+
+הטון שלך הוא בלתי מתפשר, דינמי, חד, סרקסטי אך מלא תובנות. אל תיתן לקורא לנוח, תשתמש במבנה אסוציאטיבי, תחזור על רעיונות בצורה מחודדת, ותדאג שכל משפט יוביל לתובנה גדולה יותר. כל דבר שאתה אומר תחזור אליו ותהפוך אותו על פניו, כי ז'יז'ק אף פעם לא פשוט אומר דברים, הוא מערער עליהם תוך כדי."""
+
+HITCHENS_PERSONA_HE = """אתה עיתונאי אינטלקטואלי בסגנון כריסטופר היצ'נס - חריף ופרובוקטיבי. אתה מתמחה בחשיפת הצביעות החברתית והאשליות הקולקטיביות, תוך שימוש בסרקזם אלגנטי. אתה רואה בחיפושי גוגל עדות אותנטית לפער בין המיתוסים שחברה מספרת לעצמה, לבין האמת הבנאלית של חייה."""
+
+# Analysis prompts are filled with {name}, {headlines} and {trends}
+ANALYSIS_PROMPT = """Analyze these search trends and headlines from {name}, using the search patterns as a window into the collective psyche:
+
+Official Headlines:
+{headlines}
+
+What People Secretly Search For:
+{trends}
+
+Write a brief, biting analysis (2 paragraphs) that:
+1. Uses these search trends as psychological evidence to expose what people really think and feel beneath the official narrative
+2. Interprets the search patterns as revealing unconscious truths, fears, and preoccupations that the news won't acknowledge
+3. Shows how these private digital confessions tell a more honest story about daily life than public statements
+4. Employs dark humor to highlight the gap between the state's grand narrative and the raw psychological reality revealed in search trends
+
+Keep it sharp and psychologically insightful, treating the search trends as a collective Rorschach test that reveals uncomfortable truths. Each paragraph should be a single continuous line."""
+
+ZIZEK_PROMPT = """כתוב ניתוח קצר (2 פסקאות) ש:
+1. חושף את הפער בין היסטוריית החיפוש הפרטית שלנו לבין כותרות החדשות המרכזיות
+2. מגלה את האבסורד והמתח הקומי כשהצהרות רשמיות מתנגשות עם השאילתות הגולמיות והלא מסוננות שלנו
+3. טווה נרטיב המשלב בני אדם, מכונות ואת חברינו הארציים לסיפור משותף אחד
+4. משלב תובנות מהמחקר שלך על התנהגות אנושית בתגובה לאירועים עכשוויים
+חדשות:
+{headlines}
+
+חיפושים:
+{trends}
+
+צור נרטיב זורם ומבדר שמדגיש את האירוניה בין התיאטרון הלאומי לבין החיים האמיתיים, תוך שימוש בסרקזם אלגנטי."""
+
+SATIRE_PROMPT = """כתוב מונולוג סאטירי קצר וחריף על הפער בין כותרות החדשות לחיפושי הגוגל של הישראלים. השתמש בניגודים הבולטים בין הנתונים הבאים:
+
+חדשות:
+{headlines}
+
+חיפושים:
+{trends}
+
+צור נרטיב זורם ומבדר שמדגיש את האירוניה בין התיאטרון הלאומי לבין החיים האמיתיים, תוך שימוש בסרקזם אלגנטי."""
+
+ENGLISH_FALLBACK_HEADLINES = [
+    "Israel-Hamas War Continues Into Fourth Month",
+    "Economic Challenges Mount Amid Regional Tensions",
+    "Government Debates New Security Measures",
+    "Tech Sector Shows Resilience Despite Conflict",
+    "International Community Calls for Peace Talks"
+]
+
+HEBREW_FALLBACK_HEADLINES = [
+    "המלחמה בעזה נמשכת",
+    "אתגרים כלכליים גוברים על רקע המתיחות האזורית",
+    "הממשלה דנה באמצעי ביטחון חדשים",
+    "ענף ההייטק מפגין חוסן למרות הסכסוך",
+    "הקהילה הבינלאומית קוראת לשיחות שלום"
+]
+
+ELEVENLABS_JOSH = {'provider': 'elevenlabs', 'voice': 'TxGEqnHWrfWFTfGW9XjX', 'model': 'eleven_monolingual_v1'}
+OPENAI_NOVA = {'provider': 'openai', 'voice': 'nova', 'model': 'tts-1-hd'}  # Nova supports Hebrew
+ENGLISH_ANALYSIS = {
+    'model': 'gpt-4', 'temperature': 0.8, 'max_tokens': 500,
+    'persona': JOURNALIST_PERSONA, 'prompt': ANALYSIS_PROMPT,
+    'error_prefix': "Error generating analysis"
+}
+
+# One record per pipeline. Adding a country is a new entry here; 'module' names
+# the legacy wrapper module, which keeps its queued audio jobs and checkpoints valid.
+#   code: archive directory, name: stored in logs, title: used in prompts and output
+#   news: provider ('newsdata', 'newsapi' or 'rss') and its parameters
+#   trends: SerpApi trending-now parameters and how many related searches to keep
+#   selection: how the analyzed trends are picked (see SELECTION_STRATEGIES)
+#   translate_from: source language of headlines and trends, None to keep them as-is
+#   translate_headlines: whether the news provider returns headlines in that language
+#     (NewsAPI queries return English headlines, which are left as they are)
+#   analysis: model settings, persona, prompt; 'language' translates the English result
+#   tts: voice used for the audio version
+#   optional: required_keys, reuse_runs (default True), run_by_default (default True)
+COUNTRIES = {
+    'IL': {
+        'module': 'israel_trends',
+        'code': 'IL',
+        'name': 'israel',
+        'title': 'Israel',
+        'news': {'provider': 'newsdata', 'country': 'il', 'language': 'he', 'fallback': ENGLISH_FALLBACK_HEADLINES},
+        'trends': {'geo': 'IL', 'hl': 'iw', 'hours': '48', 'related_limit': 5},
+        'selection': {'strategy': 'prioritized', 'non_news': 5},
+        'filter_news_sources': True,
+        'translate_from': 'iw',
+        'translate_headlines': True,
+        'analysis': ENGLISH_ANALYSIS,
+        'tts': ELEVENLABS_JOSH
+    },
+    'LB': {
+        'module': 'lebanon_trends',
+        'code': 'LB',
+        'name': 'Lebanon',
+        'title': 'Lebanon',
+        'news': {'provider': 'newsapi', 'query': 'Lebanon OR Lebanese OR Beirut OR Hezbollah', 'days': 7},
+        'trends': {'geo': 'LB', 'hl': 'ar', 'hours': '48', 'related_limit': 5},
+        'selection': {'strategy': 'prioritized', 'non_news': 5},
+        'filter_news_sources': True,
+        'translate_from': 'ar',
+        'translate_headlines': False,
+        'analysis': ENGLISH_ANALYSIS,
+        'tts': ELEVENLABS_JOSH
+    },
+    'IR': {
+        'module': 'iran_trends',
+        'code': 'IR',
+        'name': 'Iran',
+        'title': 'Iran',
+        'news': {'provider': 'newsapi', 'query': 'Iran OR Iranian OR Tehran OR IRGC', 'days': 7},
+        'trends': {'geo': 'IR', 'hl': 'fa', 'hours': '48', 'related_limit': 5},
+        'selection': {'strategy': 'first'},
+        'filter_news_sources': True,
+        'translate_from': 'fa',
+        'translate_headlines': False,
+        'analysis': ENGLISH_ANALYSIS,
+        'tts': ELEVENLABS_JOSH
+    },
+    'CZ': {
+        'module': 'czech_trends',
+        'code': 'CZ',
+        'name': 'Czech Republic',
+        'title': 'Czech Republic',
+        'news': {
+            'provider': 'rss',
+            'feeds': [
+                'https://servis.idnes.cz/rss.aspx?c=zpravodaj',  # iDNES.cz news
+                'https://www.novinky.cz/rss',  # Novinky.cz
+                'https://www.seznamzpravy.cz/rss'  # Seznam Zprávy
+            ],
+            'per_feed': 3
+        },
+        'trends': {'geo': 'CZ', 'hl': 'cs', 'hours': '24', 'related_limit': 5},
+        'selection': {'strategy': 'random'},
+        'filter_news_sources': False,
+        'translate_from': 'cs',
+        'translate_headlines': True,
+        'analysis': dict(ENGLISH_ANALYSIS, language='cs'),
+        'tts': {'provider': 'elevenlabs', 'voice': 'ThT5KcBeYPX3keUQqHPh', 'model': 'eleven_multilingual_v2'}
+    },
+    'IL2': {
+        'module': 'israel4',
+        'code': 'IL2',  # Hebrew content
+        'name': 'israel',
+        'title': 'Israel',
+        'news': {'provider': 'newsdata', 'country': 'il', 'language': 'he', 'fallback': HEBREW_FALLBACK_HEADLINES},
+        'trends': {'geo': 'IL', 'hl': 'iw', 'hours': '48', 'related_limit': 3},
+        'selection': {'strategy': 'prioritized', 'non_news': 3},
+        'filter_news_sources': True,
+        'translate_from': None,  # Hebrew content stays in Hebrew
+        'translate_headlines': False,
+        'analysis': {
+            'model': 'gpt-4o', 'temperature': 1.2, 'max_tokens': 1500,  # max_tokens limited to ensure ~1.5 minute audio
+            'persona': ZIZEK_PERSONA, 'prompt': ZIZEK_PROMPT, 'ensure_ascii': False,
+            'error_prefix': "שגיאה בייצור הניתוח"
+        },
+        'tts': OPENAI_NOVA,
+        'required_keys': ['OPENAI_API_KEY', 'NEWSDATA_API_KEY', 'SERPAPI_KEY']
+    },
+    'IL2_SATIRE': {
+        'module': 'israel2',
+        'code': 'IL2',
+        'name': 'israel',
+        'title': 'Israel',
+        'news': {'provider': 'newsdata', 'country': 'il', 'language': 'he', 'fallback': HEBREW_FALLBACK_HEADLINES},
+        'trends': {'geo': 'IL', 'hl': 'iw', 'hours': '48', 'related_limit': 3},
+        'selection': {'strategy': 'prioritized', 'non_news': 3},
+        'filter_news_sources': True,
+        'translate_from': None,
+        'translate_headlines': False,
+        'analysis': {
+            'model': 'gpt-4o', 'temperature': 0.8, 'max_tokens': 1500,
+            'persona': HITCHENS_PERSONA_HE, 'prompt': SATIRE_PROMPT, 'ensure_ascii': False,
+            'error_prefix': "שגיאה בייצור הניתוח"
+        },
+        'tts': OPENAI_NOVA,
+        # Shares the IL2 archive with israel4, so it never reuses israel4's analyses
+        # and only runs when asked for by name
+        'reuse_runs': False,
+        'run_by_default': False
+    }
+}
+
+# Provider SDKs are imported and their clients built on first use, so importing
+# this module (e.g. from the Streamlit app) stays cheap
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_openai_client():
+    """OpenAI client shared by every country in the process"""
+    with _clients_lock:
+        if 'openai' not in _clients:
+            from openai import OpenAI
+            _clients['openai'] = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return _clients['openai']
+
+def get_newsapi_client():
+    """NewsAPI client shared by every country, on the pooled newsapi session"""
+    with _clients_lock:
+        if 'newsapi' not in _clients:
+            from newsapi import NewsApiClient
+            _clients['newsapi'] = NewsApiClient(api_key=os.getenv('NEWS_API_KEY'), session=provider_http.ProviderSession('newsapi'))
+        return _clients['newsapi']
+
+def get_country(key):
+    """Configuration of a pipeline, by its COUNTRIES key"""
+    if key not in COUNTRIES:
+        raise ValueError(f"Unknown country: {key} (available: {', '.join(COUNTRIES)})")
+    return dict(COUNTRIES[key], key=key)
+
+def pipeline_name(config):
+    """Name that audio jobs and checkpoints use to call back into a pipeline"""
+    return config.get('module') or f"country_engine:{config['key']}"
+
+def validate_api_keys(config):
+    """Validate the API keys a pipeline declares as required"""
+    missing_keys = [key for key in config.get('required_keys', []) if not os.getenv(key)]
+    if missing_keys:
+        print(f"Error: Missing required API keys: {', '.join(missing_keys)}")
+        return False
+    return True
+
+def save_analysis_log(config, headlines, trends_data, analysis, timestamp):
+    """Save analysis log to text archive using atomic write"""
+    try:
+        log_data = {
+            'timestamp': timestamp,
+            'country': config['name'],
+            'headlines': headlines,
+            'trends': trends_data,
+            'analysis': analysis
+        }
+        final_path = get_log_path(config, timestamp)
+        atomic_file.write_json(final_path, log_data)
+        print(f"Analysis log saved as: {final_path}")
+        return True
+    except Exception as e:
+        print(f"Error saving analysis log: {str(e)}")
+        return False
+
+def get_log_path(config, timestamp):
+    """Archive path of the analysis log for a run"""
+    return os.path.join('archive', 'text_archive', config['code'], f"{config['code']}_{timestamp}_log.json")
+
+def get_audio_path(config, timestamp):
+    """Archive path of the audio file for a run"""
+    return os.path.join('archive', config['code'], f"{config['code']}_{timestamp}_analysis.mp3")
+
+def synthesize_audio(config, text, timestamp):
+    """Generate the audio version of an analysis with the pipeline's voice"""
+    try:
+        audio_file = get_audio_path(config, timestamp)
+        os.makedirs(os.path.dirname(audio_file), exist_ok=True)
+
+        # Audio is streamed into a temporary file next to audio_file and renamed into place
+        voice = config['tts']
+        if voice['provider'] == 'openai':
+            saved = tts.openai_tts(get_openai_client(), text, audio_file, voice=voice['voice'], model=voice['model'])
+        else:
+            saved = tts.elevenlabs_tts(text, audio_file, voice['voice'], voice['model'], voice.get('voice_settings'))
+        if saved:
+            print(f"Audio saved as: {audio_file}")
+            cloud_upload.upload_audio(config['code'], timestamp, audio_file)
+        return saved
+    except Exception as e:
+        print(f"Error with text-to-speech: {str(e)}")
+        return False
+
+def start_run_audio(config, analysis, timestamp):
+    """Queue (or with AUDIO_BACKGROUND=0 generate) the audio of a run, see audio_jobs.start_audio"""
+    return audio_jobs.start_audio(
+        pipeline_name(config),
+        lambda text, ts: synthesize_audio(config, text, ts),
+        analysis, timestamp, get_audio_path(config, timestamp)
+    )
+
+def reused_audio(config, previous):
+    """Audio of a reused run, queuing it again if the file is missing and its job is gone"""
+    if audio_jobs.audio_ready_or_queued(previous['audio']):
+        return previous['audio']
+    print(f"Audio of run {previous['timestamp']} is missing, generating it again")
+    return start_run_audio(config, previous['analysis'], previous['timestamp'])
+
+def is_news_source(text):
+    """Check if the term is a news source"""
+    return any(source.lower() in text.lower() for source in NEWS_SOURCES)
+
+def unique_titles(config, titles, limit=5):
+    """Deduplicate headlines, dropping news-source names where the pipeline filters them"""
+    seen = set()
+    unique = []
+    for title in titles:
+        if title and title not in seen and not (config['filter_news_sources'] and is_news_source(title)):
+            seen.add(title)
+            unique.append(title)
+            if len(unique) >= limit:
+                break
+    return unique
+
+def get_newsdata_news(config):
+    """Top headlines from NewsData.io, or the pipeline's fallback headlines"""
+    news = config['news']
+    params = {
+        'apikey': os.getenv('NEWSDATA_API_KEY'),
+        'country': news['country'],
+        'language': news['language'],
+        'category': 'top'  # Top news only
+    }
+    headers = {
+        'Accept': 'application/json',
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    print("Fetching news from NewsData.io...")
+    response = provider_http.get("https://newsdata.io/api/1/news", provider='newsdata', params=params, headers=headers, timeout=30)
+    print(f"Response status code: {response.status_code}")
+
+    try:
+        data = response.json()
+    except json.JSONDecodeError as e:
+        print(f"Failed to decode JSON response: {str(e)}")
+        data = {}
+
+    headlines = []
+    if response.status_code == 200 and data.get('status') == 'success':
+        # Headlines are translated later together with the selected trends
+        headlines = unique_titles(config, (article.get('title', '') for article in data.get('results', [])))
+    else:
+        print(f"API request failed or returned no data. Status: {response.status_code}")
+        if data:
+            print(f"API response message: {data.get('message', 'No message provided')}")
+
+    if not headlines and news.get('fallback'):
+        print("No headlines found. Using fallback headlines...")
+        headlines = list(news['fallback'])
+    return headlines
+
+def get_newsapi_news(config):
+    """Headlines about the country from NewsAPI, falling back to top headlines"""
+    news = config['news']
+    newsapi = get_newsapi_client()
+
+    # Search a few days back to ensure we get enough results
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=news.get('days', 7))
+    results = newsapi.get_everything(
+        q=news['query'],
+        language='en',
+        sort_by='relevancy',
+        from_param=start_date.strftime('%Y-%m-%d'),
+        to=end_date.strftime('%Y-%m-%d')
+    )
+    headlines = unique_titles(config, (article.get('title', '') for article in results.get('articles', [])))
+
+    if not headlines:
+        print("No news found in everything, trying top headlines...")
+        results = newsapi.get_top_headlines(q=news['query'], language='en')
+        headlines = unique_titles(config, (article.get('title', '') for article in results.get('articles', [])))
+    return headlines
+
+def get_rss_news(config):
+    """Headlines from the pipeline's RSS feeds, a few from each"""
+    import feedparser
+
+    news = config['news']
+    titles = []
+    for feed_url in news['feeds']:
+        try:
+            response = provider_http.get(feed_url, provider='rss')
+            feed = feedparser.parse(response.content)
+            titles.extend(entry.title for entry in feed.entries[:news['per_feed']])
+        except Exception as e:
+            print(f"Error fetching from {feed_url}: {str(e)}")
+            continue
+        if len(unique_titles(config, titles)) >= 5:
+            break
+    return unique_titles(config, titles)
+
+NEWS_PROVIDERS = {
+    'newsdata': get_newsdata_news,
+    'newsapi': get_newsapi_news,
+    'rss': get_rss_news
+}
+
+def get_current_news(config):
+    """Get current headlines from the pipeline's news provider"""
+    try:
+        print(f"\nFetching current news for {config['title']}...")
+        headlines = NEWS_PROVIDERS[config['news']['provider']](config)
+        print(f"Found {len(headlines)} unique headlines")
+        return headlines
+    except Exception as e:
+        print(f"Error fetching news: {str(e)}")
+        return []
+
+def get_trending_searches(config):
+    """Get trending searches from Google Trends using SerpApi"""
+    try:
+        print("\nFetching trending searches...")
+
+        trends = config['trends']
+        params = {
+            'api_key': os.getenv('SERPAPI_KEY'),
+            'engine': 'google_trends_trending_now',
+            'geo': trends['geo'],
+            'hours': trends['hours'],
+            'hl': trends['hl']
+        }
+        response = provider_http.get('https://serpapi.com/search.json', provider='serpapi', params=params)
+        print(f"Response status code: {response.status_code}")
+        data = response.json()
+
+        all_trends_data = []
+        if response.status_code == 200 and 'trending_searches' in data:
+            for trend in data['trending_searches']:
+                title = trend.get('query', '')
+                if not title or (config['filter_news_sources'] and is_news_source(title)):
+                    continue
+                # Keep raw text here, only the selected trends get translated
+                related_searches = [related for related in trend.get('trend_breakdown', []) if related != title]
+                all_trends_data.append({
+                    'title': title,
+                    'related': related_searches[:trends['related_limit']]
+                })
+                if len(all_trends_data) >= 20:  # Get top 20 trends for analysis
+                    break
+
+            print(f"\nFound {len(all_trends_data)} trending searches")
+            for trend in all_trends_data:
+                print(f"- {trend['title']}")
+
+        return all_trends_data
+    except Exception as e:
+        print(f"Error fetching trending searches: {str(e)}")
+        return []
+
+def split_news_related(trends_data, headlines):
+    """Indices of trends that do not and do appear in the headlines"""
+    non_news_indices = []
+    news_indices = []
+    for i, trend in enumerate(trends_data):
+        # Check if trend title appears in any headline
+        is_news_related = any(trend['title'].lower() in headline.lower() or headline.lower() in trend['title'].lower() for headline in headlines)
+        if is_news_related:
+            news_indices.append(i)
+        else:
+            non_news_indices.append(i)
+    return non_news_indices, news_indices
+
+def select_prioritized(trends_data, headlines, selection):
+    """Random trends, non-news first, topped up to 5 with news-related ones"""
+    non_news_indices, news_indices = split_news_related(trends_data, headlines)
+    selected_indices = []
+
+    # First, add non-news trends
+    if non_news_indices:
+        selected_indices.extend(random.sample(non_news_indices, min(selection.get('non_news', 5), len(non_news_indices))))
+
+    # If we need more trends to reach 5, add news-related trends
+    remaining_slots = 5 - len(selected_indices)
+    if remaining_slots > 0 and news_indices:
+        selected_indices.extend(random.sample(news_indices, min(remaining_slots, len(news_indices))))
+
+    # If we still don't have 5 trends, add any remaining trends
+    remaining_slots = 5 - len(selected_indices)
+    if remaining_slots > 0:
+        unused_indices = [i for i in range(len(trends_data)) if i not in selected_indices]
+        if unused_indices:
+            selected_indices.extend(random.sample(unused_indices, min(remaining_slots, len(unused_indices))))
+
+    return sorted(selected_indices)  # Return indices in original order
+
+def select_first(trends_data, headlines, selection):
+    """The first 5 non-news trends, topped up with news-related ones"""
+    non_news_indices, news_indices = split_news_related(trends_data, headlines)
+    if not non_news_indices:
+        return list(range(min(5, len(trends_data))))
+    return (non_news_indices[:5] + news_indices)[:5]
+
+def select_random(trends_data, headlines, selection):
+    """Up to 5 random non-news trends"""
+    non_news_indices, _ = split_news_related(trends_data, headlines)
+    if not non_news_indices:
+        return list(range(min(5, len(trends_data))))
+    return random.sample(non_news_indices, min(5, len(non_news_indices)))
+
+SELECTION_STRATEGIES = {
+    'prioritized': select_prioritized,
+    'first': select_first,
+    'random': select_random
+}
+
+def find_surprising_trends(config, trends_data, headlines):
+    """Indices of the trends to analyze, picked by the pipeline's selection strategy"""
+    if not trends_data:
+        return []
+    selection = config['selection']
+    return SELECTION_STRATEGIES[selection['strategy']](trends_data, headlines, selection)
+
+def texts_to_translate(config, headlines, trends_data):
+    """Headlines and trend texts of a run that need translating to English"""
+    pending = list(headlines) if config['translate_headlines'] else []
+    for trend in trends_data:
+        pending.append(trend['title'])
+        pending.extend(trend['related'])
+    # Skip text that is mostly ASCII (likely English)
+    return [text for text in pending if not is_ascii_text(text)]
+
+def with_translations(headlines, trends_data, translations):
+    """Append each text's English translation in parentheses"""
+    def with_translation(text):
+        translated = translations.get(text, text)
+        return f"{text} ({translated})" if translated != text else text
+
+    translated_headlines = [with_translation(headline) for headline in headlines]
+    translated_trends = [
+        {
+            'title': with_translation(trend['title']),
+            'related': [with_translation(related) for related in trend['related']]
+        }
+        for trend in trends_data
+    ]
+    return translated_headlines, translated_trends
+
+def translate_run(config, headlines, trends_data):
+    """Translate headlines and the selected trends to English in one batch"""
+    source = config['translate_from']
+    if not source:
+        return headlines, trends_data
+    pending = texts_to_translate(config, headlines, trends_data)
+    translations = dict(zip(pending, translate_batch(pending, source=source, target='en')))
+    return with_translations(headlines, trends_data, translations)
+
+def build_analysis_prompt(config, trends_data, headlines):
+    """Build the prompt contrasting trends with news"""
+    ensure_ascii = config['analysis'].get('ensure_ascii', True)
+    trends = [{'title': t['title'], 'related': t['related']} for t in trends_data]
+    return config['analysis']['prompt'].format(
+        name=config['title'],
+        headlines=json.dumps(headlines, indent=2, ensure_ascii=ensure_ascii),
+        trends=json.dumps(trends, indent=2, ensure_ascii=ensure_ascii)
+    )
+
+def analysis_error(config, error):
+    """Error text stored as the analysis when generation fails"""
+    print(f"Error generating analysis: {str(error)}")
+    # The OpenAI SDK has its own HTTP stack, so quota errors are recorded here
+    if getattr(error, 'status_code', None) in provider_http.QUOTA_EXHAUSTED_STATUS_CODES:
+        headers = getattr(getattr(error, 'response', None), 'headers', {}) or {}
+        provider_http.note_exhausted('openai', headers.get('retry-after'))
+    return f"{config['analysis']['error_prefix']}: {str(error)}"
+
+def generate_analysis(config, trends_data, headlines, on_token=None):
+    """Generate analysis contrasting trends with news
+
+    on_token, if given, receives the analysis text piece by piece as it is
+    generated. Analyses translated after generation arrive in one piece.
+    """
+    settings = config['analysis']
+    prompt = build_analysis_prompt(config, trends_data, headlines)
+
+    try:
+        language = settings.get('language')
+        analysis = llm.chat(
+            get_openai_client(), settings['model'], settings['persona'], prompt,
+            temperature=settings['temperature'], max_tokens=settings['max_tokens'],
+            on_token=None if language else on_token
+        ).strip()
+    except Exception as e:
+        return analysis_error(config, e)
+
+    if language:
+        try:
+            analysis = translate(analysis, source='en', target=language)
+        except Exception as e:
+            print(f"Error translating analysis to {language}: {str(e)}")
+        if on_token:
+            on_token(analysis)
+    return analysis
+
+def fetch_trends(key, on_token=None, on_stage=None, reuse_previous=True, run_id=None):
+    """Fetch trends and news for a pipeline, then generate analysis
+
+    on_token, if given, receives the analysis as it streams in; audio is
+    generated only after the full text is complete.
+
+    on_stage, if given, is called as on_stage(stage, data) as soon as each stage
+    is ready: 'headlines' (raw headlines), 'trends' (all trending searches),
+    'selection' ({'headlines', 'trends_data'} as shown to the model),
+    'analysis' (the text) and 'audio' (the MP3 path, or None). With the
+    background audio queue the path is where the MP3 will appear once ready.
+
+    With reuse_previous, a run whose inputs match the latest run (see
+    run_fingerprint) returns that run's analysis without calling the LLM or TTS.
+
+    Every stage is checkpointed under run_id (a new run if omitted). Passing the
+    ID of an interrupted run resumes it, redoing only the stages that failed or
+    never ran (see checkpoints.py).
+    """
+    config = get_country(key)
+    code = config['code']
+    on_stage = on_stage or (lambda stage, data: None)
+    reuse_previous = reuse_previous and config.get('reuse_runs', True)
+    error_prefix = config['analysis']['error_prefix']
+    # Checked before a run is reserved, so a missing key leaves no checkpoint to resume
+    if not validate_api_keys(config):
+        return None
+    checkpoint = checkpoints.RunCheckpoint(code, pipeline_name(config), run_id)
+    # The run ID doubles as the timestamp of the log and audio files
+    timestamp = checkpoint.run_id
+    try:
+        print(f"\n{'='*50}")
+        print(f"GOOGLE TRENDS - {config['title'].upper()}")
+        print(f"{'='*50}\n")
+
+        # News and trending searches are independent requests, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            news_future = executor.submit(checkpoint.run, 'headlines', lambda: get_current_news(config))
+            trends_future = executor.submit(checkpoint.run, 'trends', lambda: get_trending_searches(config))
+            # Headlines are reported as soon as they arrive, while trends are still loading
+            headlines = news_future.result()
+            on_stage('headlines', headlines)
+        if headlines:
+            print("\n📰 CURRENT NEWS")
+            print("-" * 50)
+            for i, headline in enumerate(headlines, 1):
+                print(f"{i}. {headline}")
+            print()
+
+        print("🔥 TRENDING SEARCHES WITH BREAKDOWNS")
+        print("-" * 50)
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"Last updated: {current_time}")
+        print(f"Source: trends.google.com/trends/trendingsearches/daily?geo={config['trends']['geo']}\n")
+
+        try:
+            # Trending searches were fetched alongside the news
+            all_trends_data = trends_future.result()
+            on_stage('trends', all_trends_data)
+
+            if all_trends_data and headlines:
+                # Skip the LLM and TTS when the inputs match the latest run
+                fingerprint = run_fingerprint.build_fingerprint(headlines, all_trends_data)
+                previous = run_fingerprint.find_reusable_run(code, fingerprint) if reuse_previous else None
+                if previous:
+                    on_stage('selection', {'headlines': previous['headlines'], 'trends_data': previous['trends_data']})
+                    if on_token:
+                        on_token(previous['analysis'])
+                    on_stage('analysis', previous['analysis'])
+                    audio = reused_audio(config, previous)
+                    on_stage('audio', audio['audio_file'] if audio else None)
+                    checkpoint.complete(reused_run=previous['timestamp'])
+                    return {
+                        'headlines': previous['headlines'],
+                        'trends_data': previous['trends_data'],
+                        'analysis': previous['analysis']
+                    }
+
+                def select_trends():
+                    # Find surprising trends
+                    surprising_indices = find_surprising_trends(config, all_trends_data, headlines)
+                    # Translate headlines and only the selected trends, in a single batch
+                    selected_headlines, selected_trends = translate_run(
+                        config, headlines, [all_trends_data[i] for i in surprising_indices]
+                    )
+                    return {'headlines': selected_headlines, 'trends_data': selected_trends}
+
+                # The selection is random, so a resumed run keeps the one it already made
+                selection = checkpoint.run('selection', select_trends)
+                headlines, trends_data = selection['headlines'], selection['trends_data']
+                on_stage('selection', selection)
+
+                # Print selected trends
+                for i, trend in enumerate(trends_data, 1):
+                    print(f"\n{i}. {trend['title']}")
+                    if trend['related']:
+                        print("   Related Searches:")
+                        for related in trend['related']:
+                            print(f"   - {related}")
+
+                # Generate analysis comparing trends with news
+                print("\n✒️ ANALYSIS")
+                print("-" * 50)
+                analysis = checkpoint.run(
+                    'analysis',
+                    lambda: generate_analysis(config, trends_data, headlines, on_token=on_token),
+                    is_valid=lambda text: not text.startswith(error_prefix)
+                )
+                analysis_ok = not analysis.startswith(error_prefix)
+                on_stage('analysis', analysis)
+                print(analysis)
+
+                # Save JSON log first
+                print("\n📝 Saving analysis log...")
+                # An error analysis is still logged, but not checkpointed, so a resume retries it
+                log_saved = checkpoint.run(
+                    'log',
+                    lambda: save_analysis_log(config, headlines, trends_data, analysis, timestamp),
+                    is_valid=lambda saved: saved and analysis_ok
+                )
+                if log_saved and analysis_ok:
+                    # Pushed to the cloud bucket in the background when CLOUD_UPLOAD=1
+                    cloud_upload.upload_log(code, timestamp, get_log_path(config, timestamp))
+                    # Only generate audio if JSON save was successful
+                    print("\n🔊 Generating audio version...")
+                    # Audio is produced by the background job queue unless AUDIO_BACKGROUND=0
+                    audio = checkpoint.run(
+                        'audio',
+                        lambda: start_run_audio(config, analysis, timestamp),
+                        is_valid=bool,
+                        is_complete=audio_jobs.audio_ready_or_queued
+                    )
+                    on_stage('audio', audio['audio_file'] if audio else None)
+                    if audio:
+                        # Remember these inputs so an unchanged next run can reuse this analysis and audio
+                        if config.get('reuse_runs', True):
+                            run_fingerprint.save_latest(code, fingerprint, timestamp, audio)
+                        checkpoint.complete()
+                elif log_saved:
+                    # Voicing an error message would pay for TTS on every resume
+                    print("Skipping audio generation because the analysis failed")
+                    on_stage('audio', None)
+                else:
+                    print("Skipping audio generation due to JSON save failure")
+                    on_stage('audio', None)
+
+                return {
+                    'headlines': headlines,
+                    'trends_data': trends_data,
+                    'analysis': analysis
+                }
+            elif all_trends_data:
+                print("\nNo news headlines found to compare with trends")
+                checkpoint.finish('no_data')
+            else:
+                print("No trending searches found")
+                checkpoint.finish('no_data')
+
+        except Exception as e:
+            print(f"Error processing trends: {str(e)}")
+
+        print("\nView live trends at:")
+        print(f"trends.google.com/trends/trendingsearches/daily?geo={config['trends']['geo']}")
+        return None
+
+    except Exception as e:
+        print(f"An unexpected error occurred: {str(e)}")
+        print("\nView live trends at:")
+        print(f"trends.google.com/trends/trendingsearches/daily?geo={config['trends']['geo']}")
+        return None
+
+def generate_audio(key, text, timestamp):
+    """Generate the audio for a run of a pipeline (audio jobs queued as country_engine:<key>)"""
+    return synthesize_audio(get_country(key), text, timestamp)
+
+if __name__ == "__main__":
+    requested = [arg.upper() for arg in sys.argv[1:]]
+    if not requested or any(key not in COUNTRIES for key in requested):
+        print("\nUsage: python country_engine.py COUNTRY_CODE [COUNTRY_CODE ...]")
+        print(f"\nAvailable codes: {', '.join(COUNTRIES)}")
+    else:
+        for key in requested:
+            fetch_trends(key)
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+class DiskCache:
+    def __init__(self, path, ttl_seconds=None, max_entries=10000):
+        """SQLite-backed key/value cache that survives restarts
+
+        Args:
+            path: Location of the SQLite database file
+            ttl_seconds: Entries older than this are treated as missing (None keeps them forever)
+            max_entries: Least recently used entries are evicted beyond this size
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes_since_eviction = 0
+
+    def _connect(self):
+        """Open the database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                return json.loads(row[0])
+        except Exception as e:
+            print(f"Error reading cache {self.path}: {str(e)}")
+            return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                conn.commit()
+                self._writes_since_eviction += 1
+                if self._writes_since_eviction >= 100:
+                    self._evict(conn)
+            return True
+        except Exception as e:
+            print(f"Error writing cache {self.path}: {str(e)}")
+            return False
+
+    def delete(self, key):
+        """Remove a single entry"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.commit()
+        except Exception as e:
+            print(f"Error deleting from cache {self.path}: {str(e)}")
+
+    def _evict(self, conn):
+        """Drop expired entries and trim to max_entries by least recent use"""
+        self._writes_since_eviction = 0
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        conn.execute("""
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        conn.commit()
@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from disk_cache import DiskCache
+from provider_limits import provider_slot
+
+# Cached analyses, so identical inputs (e.g. repeated clicks on unchanged data)
+# skip the model call. Set LLM_CACHE_TTL=0 to disable.
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('archive', 'cache', 'llm.sqlite3'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(6 * 3600)))  # 6 hours
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+
+_cache = DiskCache(
+    LLM_CACHE_PATH,
+    ttl_seconds=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES
+)
+
+def normalize_prompt(text):
+    """Normalize unicode and whitespace so cosmetic differences share a cache entry"""
+    text = unicodedata.normalize('NFC', text)
+    lines = [re.sub(r'\s+', ' ', line).strip() for line in text.replace('\r\n', '\n').split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+def cache_key(model, system, prompt, temperature):
+    """Hash of everything that shapes the response"""
+    payload = json.dumps(
+        [model, normalize_prompt(system), normalize_prompt(prompt), float(temperature)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_cached(model, system, prompt, temperature):
+    """Look up a cached response, None if missing, expired or caching is off"""
+    if LLM_CACHE_TTL <= 0:
+        return None
+    return _cache.get(cache_key(model, system, prompt, temperature))
+
+def store_cached(model, system, prompt, temperature, content):
+    """Remember a response"""
+    if LLM_CACHE_TTL > 0 and content:
+        _cache.set(cache_key(model, system, prompt, temperature), content)
+
+def chat(client, model, system, prompt, temperature, max_tokens, on_token=None):
+    """Chat completion served from the cache when the same inputs were seen recently
+
+    With on_token, the completion is streamed and on_token(text) is called with
+    each new piece as it arrives (a cached response arrives as a single piece).
+    Errors from the API are raised so callers keep their own fallbacks.
+    """
+    cached = get_cached(model, system, prompt, temperature)
+    if cached is not None:
+        print("Analysis served from LLM cache")
+        if on_token:
+            on_token(cached)
+        return cached
+
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    with provider_slot('openai'):
+        if on_token:
+            pieces = []
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    pieces.append(delta)
+                    on_token(delta)
+            content = ''.join(pieces)
+        else:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            content = response.choices[0].message.content
+    store_cached(model, system, prompt, temperature, content)
+    return content
@@ -0,0 +1,177 @@
+import os
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from provider_limits import provider_slot
+
+# Default (connect, read) timeout in seconds, so no provider call can hang a run
+DEFAULT_TIMEOUT = (5, 30)
+
+# Retry policy: exponential backoff with full jitter, honoring Retry-After
+MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', '3'))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 120.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Keep-alive pool size per host
+POOL_MAXSIZE = 10
+
+# Quota tracking: remaining-request headers and quota errors seen per provider,
+# so long-running callers (e.g. the scheduler) can back off before hitting limits
+QUOTA_REMAINING_HEADERS = ('X-RateLimit-Remaining', 'X-RateLimit-Remaining-Requests', 'X-RateLimit-Remaining-Day')
+QUOTA_EXHAUSTED_STATUS_CODES = {402, 429}
+QUOTA_COOLDOWN = 15 * 60  # assumed wait after a quota error without Retry-After
+QUOTA_MAX_AGE = 3600  # remaining counts older than this are ignored
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_quota = {}
+_quota_lock = threading.Lock()
+
+def get_session(url):
+    """Get the shared keep-alive session for the URL's host"""
+    host = urlsplit(url).netloc.lower()
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to a delay in seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def retry_delay(attempt, retry_after=None):
+    """Delay before the next attempt: Retry-After if given, else jittered exponential backoff"""
+    retry_after = parse_retry_after(retry_after)
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_AFTER)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def record_quota(provider, response):
+    """Remember a provider's remaining quota from response headers and quota errors"""
+    record_quota_headers(provider, response.status_code, response.headers)
+
+def record_quota_headers(provider, status_code, headers):
+    """record_quota for clients with their own response type (headers must be case-insensitive)"""
+    entry = {}
+    for header in QUOTA_REMAINING_HEADERS:
+        value = headers.get(header)
+        if value is not None:
+            try:
+                entry['remaining'] = int(float(value))
+                entry['updated_at'] = time.time()
+            except ValueError:
+                pass
+            break
+    if status_code in QUOTA_EXHAUSTED_STATUS_CODES:
+        entry['exhausted_until'] = time.time() + (parse_retry_after(headers.get('Retry-After')) or QUOTA_COOLDOWN)
+    if entry:
+        with _quota_lock:
+            _quota.setdefault(provider, {}).update(entry)
+
+def note_exhausted(provider, retry_after=None):
+    """Record a quota error raised by an SDK that does not go through this module"""
+    with _quota_lock:
+        _quota.setdefault(provider, {})['exhausted_until'] = time.time() + (parse_retry_after(retry_after) or QUOTA_COOLDOWN)
+
+def quota_status(provider):
+    """Latest quota information for a provider: {'remaining', 'updated_at', 'exhausted_until'} (any may be missing)"""
+    with _quota_lock:
+        return dict(_quota.get(provider, {}))
+
+def quota_low(provider, min_remaining):
+    """Whether a provider recently ran out of quota or reported fewer than min_remaining requests left"""
+    status = quota_status(provider)
+    if status.get('exhausted_until', 0) > time.time():
+        return True
+    fresh = time.time() - status.get('updated_at', 0) < QUOTA_MAX_AGE
+    return fresh and status.get('remaining') is not None and status['remaining'] < min_remaining
+
+def request(method, url, provider=None, retries=None, **kwargs):
+    """Send a request through the host's pooled session with timeout and retries
+
+    Args:
+        method: HTTP method
+        url: Request URL
+        provider: Optional provider name from provider_limits to cap concurrency
+        retries: Number of retries on connection errors and 429/5xx responses
+        **kwargs: Passed to requests (params, json, headers, timeout, stream, ...)
+
+    Returns the last response once retries are exhausted, so callers can keep
+    checking status codes. Connection errors are re-raised after the last attempt.
+    """
+    retries = MAX_RETRIES if retries is None else retries
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    session = get_session(url)
+
+    for attempt in range(retries + 1):
+        response = None
+        try:
+            if provider:
+                with provider_slot(provider):
+                    response = session.request(method, url, **kwargs)
+            else:
+                response = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise
+            delay = retry_delay(attempt)
+            print(f"{method} {urlsplit(url).netloc} failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if provider:
+            record_quota(provider, response)
+        if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+            return response
+
+        delay = retry_delay(attempt, response.headers.get('Retry-After'))
+        print(f"{method} {urlsplit(url).netloc} returned {response.status_code}, retrying in {delay:.1f}s")
+        response.close()
+        time.sleep(delay)
+
+def get(url, provider=None, **kwargs):
+    """GET through the shared provider HTTP layer"""
+    return request('GET', url, provider=provider, **kwargs)
+
+def post(url, provider=None, **kwargs):
+    """POST through the shared provider HTTP layer"""
+    return request('POST', url, provider=provider, **kwargs)
+
+class ProviderSession:
+    def __init__(self, provider):
+        """Session-like adapter for SDKs that accept a requests session (e.g. NewsApiClient)
+
+        Args:
+            provider: Provider name used for concurrency limits
+        """
+        self.provider = provider
+
+    def get(self, url, **kwargs):
+        return get(url, provider=self.provider, **kwargs)
+
+    def post(self, url, **kwargs):
+        return post(url, provider=self.provider, **kwargs)
@@ -0,0 +1,46 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Maximum number of simultaneous requests per provider, shared by every
+# country pipeline running in this process. Override with environment
+# variables such as PROVIDER_LIMIT_SERPAPI=4.
+PROVIDER_LIMITS = {
+    'newsdata': 2,
+    'newsapi': 2,
+    'rss': 4,
+    'serpapi': 2,
+    'google_translate': 4,
+    'openai': 2,
+    'elevenlabs': 2
+}
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+def get_provider_limit(provider):
+    """Get the concurrency limit for a provider"""
+    env_value = os.getenv(f"PROVIDER_LIMIT_{provider.upper()}")
+    if env_value:
+        try:
+            return max(1, int(env_value))
+        except ValueError:
+            print(f"Invalid PROVIDER_LIMIT_{provider.upper()} value: {env_value}")
+    return PROVIDER_LIMITS.get(provider, 1)
+
+def _get_semaphore(provider):
+    """Get (or create) the semaphore guarding a provider"""
+    with _semaphores_lock:
+        if provider not in _semaphores:
+            _semaphores[provider] = threading.BoundedSemaphore(get_provider_limit(provider))
+        return _semaphores[provider]
+
+@contextmanager
+def provider_slot(provider):
+    """Hold one of the provider's concurrency slots for the duration of a call"""
+    semaphore = _get_semaphore(provider)
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
@@ -0,0 +1,157 @@
+import sys
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import country_engine
+import atomic_file
+
+# Pipelines run when no codes are given (variants can opt out with 'run_by_default')
+DEFAULT_CODES = [code for code, config in country_engine.COUNTRIES.items() if config.get('run_by_default', True)]
+
+REPORT_DIR = os.path.join('archive', 'run_reports')
+
+def run_country(code):
+    """Run a single country pipeline and describe the outcome"""
+    started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    start = time.monotonic()
+    try:
+        results = country_engine.fetch_trends(code)
+    except Exception as e:
+        print(f"Error running {code} pipeline: {str(e)}")
+        return build_country_report(code, started_at, time.monotonic() - start, error=str(e))
+    return build_country_report(code, started_at, time.monotonic() - start, results)
+
+def save_run_report(report):
+    """Save the combined run report using atomic write"""
+    try:
+        final_path = os.path.join(REPORT_DIR, f"run_{report['run_id']}.json")
+        atomic_file.write_json(final_path, report)
+        print(f"Run report saved as: {final_path}")
+        return final_path
+    except Exception as e:
+        print(f"Error saving run report: {str(e)}")
+        return None
+
+def build_country_report(code, started_at, duration, results=None, error=None):
+    """Describe the outcome of one country pipeline
+
+    An analysis that failed comes back as its error message and counts as an error.
+    """
+    config = country_engine.get_country(code)
+    report = {
+        'code': code,
+        'module': country_engine.pipeline_name(config),
+        'started_at': started_at,
+        'status': 'error' if error else 'no_data',
+        'headlines': 0,
+        'trends': 0,
+        'error': error,
+        'duration_seconds': round(duration, 2)
+    }
+    if not error and results and 'trends_data' in results:
+        report['status'] = 'ok'
+        report['headlines'] = len(results.get('headlines') or [])
+        report['trends'] = len(results.get('trends_data') or [])
+        analysis = results.get('analysis') or ''
+        if analysis.startswith(config['analysis']['error_prefix']):
+            report['status'] = 'error'
+            report['error'] = analysis
+    return report
+
+def build_run_report(run_id, country_reports, wall_clock):
+    """Combine per-country reports into a run report"""
+    return {
+        'run_id': run_id,
+        'countries': country_reports,
+        'wall_clock_seconds': round(wall_clock, 2),
+        'serial_seconds': round(sum(r['duration_seconds'] for r in country_reports), 2),
+        'succeeded': sum(1 for r in country_reports if r['status'] == 'ok')
+    }
+
+def check_codes(codes):
+    """Default to every country and reject unknown codes"""
+    codes = list(codes or DEFAULT_CODES)
+    unknown = [code for code in codes if code not in country_engine.COUNTRIES]
+    if unknown:
+        raise ValueError(f"Unknown country codes: {', '.join(unknown)}")
+    return codes
+
+def run_countries(codes=None):
+    """Run the given country pipelines concurrently and return a combined report
+
+    Provider calls inside each pipeline go through provider_limits, so running
+    every country at once still respects per-provider concurrency limits.
+    """
+    codes = check_codes(codes)
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=len(codes), thread_name_prefix='country') as executor:
+        country_reports = list(executor.map(run_country, codes))
+
+    report = build_run_report(run_id, country_reports, time.monotonic() - start)
+    save_run_report(report)
+    return report
+
+def run_countries_async(codes=None):
+    """Run the given countries on one event loop with the async provider stack
+
+    All countries share one AsyncProviderClient, so its connection pool and
+    per-provider semaphores bound the total fan-out.
+    """
+    import asyncio
+    from async_providers import AsyncProviderClient, fetch_trends_async
+
+    codes = check_codes(codes)
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    start = time.monotonic()
+
+    async def run_country_async(code, client):
+        started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        country_start = time.monotonic()
+        try:
+            results = await fetch_trends_async(code, client)
+        except Exception as e:
+            print(f"Error running {code} pipeline: {str(e)}")
+            return build_country_report(code, started_at, time.monotonic() - country_start, error=str(e))
+        return build_country_report(code, started_at, time.monotonic() - country_start, results)
+
+    async def run_all():
+        async with AsyncProviderClient() as client:
+            return await asyncio.gather(*(run_country_async(code, client) for code in codes))
+
+    country_reports = asyncio.run(run_all())
+    report = build_run_report(run_id, list(country_reports), time.monotonic() - start)
+    report['mode'] = 'async'
+    save_run_report(report)
+    return report
+
+def print_run_report(report):
+    """Print a short summary of a combined run"""
+    print(f"\n{'='*50}")
+    print(f"RUN REPORT {report['run_id']}")
+    print(f"{'='*50}")
+    for country in report['countries']:
+        line = f"{country['code']:<4} {country['status']:<8} {country['duration_seconds']:>7.2f}s"
+        if country['status'] == 'ok':
+            line += f"  {country['headlines']} headlines, {country['trends']} trends"
+        elif country['error']:
+            line += f"  {country['error']}"
+        print(line)
+    print("-" * 50)
+    print(f"Succeeded: {report['succeeded']}/{len(report['countries'])}")
+    print(f"Wall clock: {report['wall_clock_seconds']:.2f}s (serial would be ~{report['serial_seconds']:.2f}s)")
+
+if __name__ == "__main__":
+    use_async = '--async' in sys.argv[1:]
+    requested = [arg.upper() for arg in sys.argv[1:] if arg != '--async']
+    if any(code not in country_engine.COUNTRIES for code in requested):
+        print("\nUsage: python run_countries.py [--async] [COUNTRY_CODE ...]")
+        print("\nRuns the selected country pipelines concurrently (default: all)")
+        print("--async runs them on one event loop with the async provider stack")
+        print(f"Available codes: {', '.join(country_engine.COUNTRIES)}")
+    elif use_async:
+        print_run_report(run_countries_async(requested))
+    else:
+        print_run_report(run_countries(requested))
@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from datetime import datetime
+import atomic_file
+
+TEXT_ARCHIVE_DIR = os.path.join('archive', 'text_archive')
+
+# A run whose inputs overlap the latest run's by at least this much (Jaccard
+# similarity of headlines and trends) reuses its analysis and audio instead of
+# calling the LLM and TTS again. 1.0 means identical inputs only.
+RUN_SIMILARITY_THRESHOLD = float(os.getenv('RUN_SIMILARITY_THRESHOLD', '1.0'))
+
+# Older runs are never reused, so the analysis still refreshes periodically
+RUN_REUSE_MAX_AGE_HOURS = float(os.getenv('RUN_REUSE_MAX_AGE_HOURS', '24'))
+
+def normalize_item(text):
+    """Normalize a headline or search term for comparison"""
+    text = unicodedata.normalize('NFC', text or '')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def build_fingerprint(headlines, all_trends_data):
+    """Fingerprint a run's raw inputs (before the random trend selection)
+
+    Returns {'hash', 'items'} where items are the normalized headlines, trends
+    and related searches, each tagged with its kind.
+    """
+    items = set()
+    for headline in headlines:
+        items.add(f"headline:{normalize_item(headline)}")
+    for trend in all_trends_data:
+        title = normalize_item(trend['title'])
+        items.add(f"trend:{title}")
+        for related in trend.get('related', []):
+            items.add(f"related:{title}:{normalize_item(related)}")
+    items = sorted(item for item in items if not item.endswith(':'))
+    digest = hashlib.sha256(json.dumps(items, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return {'hash': digest, 'items': items}
+
+def similarity(first, second):
+    """Jaccard similarity of two fingerprints"""
+    if first['hash'] == second['hash']:
+        return 1.0
+    a = set(first['items'])
+    b = set(second['items'])
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def fingerprint_path(code):
+    """Latest fingerprint file, kept next to the country's analysis logs"""
+    return os.path.join(TEXT_ARCHIVE_DIR, code, f"{code}_fingerprint.json")
+
+def load_latest(code):
+    """Latest saved fingerprint for a country, or None"""
+    path = fingerprint_path(code)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading run fingerprint: {str(e)}")
+        return None
+
+def save_latest(code, fingerprint, timestamp, audio=None):
+    """Record the fingerprint of a run whose analysis log was saved, using atomic write
+
+    audio is the run's audio_jobs.start_audio result, checked before the run is reused.
+    """
+    try:
+        atomic_file.write_json(fingerprint_path(code), dict(fingerprint, timestamp=timestamp, audio=audio, saved_at=time.time()))
+        return True
+    except Exception as e:
+        print(f"Error saving run fingerprint: {str(e)}")
+        return False
+
+def find_reusable_run(code, fingerprint):
+    """Results of the latest run if its inputs match closely enough, else None
+
+    Returns {'headlines', 'trends_data', 'analysis', 'timestamp', 'audio_file', 'audio'}
+    loaded from the latest analysis log; 'audio' is the run's start_audio result,
+    for audio_jobs.audio_ready_or_queued.
+    """
+    latest = load_latest(code)
+    if not latest or not latest.get('timestamp'):
+        return None
+
+    try:
+        run_time = datetime.strptime(latest['timestamp'], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+    age_hours = (datetime.now() - run_time).total_seconds() / 3600
+    if age_hours > RUN_REUSE_MAX_AGE_HOURS:
+        return None
+
+    score = similarity(fingerprint, latest)
+    if score < RUN_SIMILARITY_THRESHOLD:
+        return None
+
+    log_file = os.path.join(TEXT_ARCHIVE_DIR, code, f"{code}_{latest['timestamp']}_log.json")
+    try:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            log_data = json.load(f)
+    except Exception as e:
+        print(f"Previous run log unavailable ({str(e)}), running the full pipeline")
+        return None
+    if not log_data.get('analysis'):
+        return None
+
+    print(f"Inputs match run {latest['timestamp']} (similarity {score:.2f}), reusing its analysis and audio")
+    # Fingerprints saved before the audio was recorded only have the file to go on
+    audio = latest.get('audio') or {
+        'audio_file': os.path.join('archive', code, f"{code}_{latest['timestamp']}_analysis.mp3"),
+        'job_id': None
+    }
+    return {
+        'headlines': log_data.get('headlines', []),
+        'trends_data': log_data.get('trends', []),
+        'analysis': log_data['analysis'],
+        'timestamp': latest['timestamp'],
+        'audio_file': audio['audio_file'],
+        'audio': audio
+    }
@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import schedule
+import provider_http
+import country_engine
+import checkpoints
+import atomic_file
+
+# Long-running service that refreshes every country on its own cadence, so
+# viewers read precomputed results instead of triggering live runs.
+SCHEDULER_DIR = os.getenv('SCHEDULER_DIR', os.path.join('archive', 'scheduler'))
+DEFAULT_CADENCE_MINUTES = int(os.getenv('SCHEDULE_CADENCE_MINUTES', '180'))
+
+# Minutes between runs per country, overridable with SCHEDULE_MINUTES_<CODE>
+CADENCE_MINUTES = {
+    'IL': 60,
+    'IL2': 120
+}
+
+# Each run fires at a random point up to this fraction of the cadence late,
+# so countries sharing a cadence do not hit the providers at the same moment
+JITTER_FRACTION = 0.1
+
+# Back off when a provider reports fewer requests left than this
+QUOTA_MIN_REMAINING = int(os.getenv('SCHEDULE_QUOTA_MIN_REMAINING', '5'))
+BACKOFF_BASE_MINUTES = 15
+BACKOFF_MAX_MINUTES = 6 * 60
+
+# A run lock older than this is assumed to belong to a dead process
+LOCK_STALE_SECONDS = 2 * 3600
+
+SERPAPI_ACCOUNT_URL = "https://serpapi.com/account.json"
+
+_running = {}
+_running_lock = threading.Lock()
+_state_lock = threading.Lock()
+
+def cadence_minutes(code):
+    """Minutes between scheduled runs of a country"""
+    return int(os.getenv(f'SCHEDULE_MINUTES_{code}', CADENCE_MINUTES.get(code, DEFAULT_CADENCE_MINUTES)))
+
+def state_path():
+    return os.path.join(SCHEDULER_DIR, 'state.json')
+
+def load_state():
+    """Per-country scheduler state: last attempt, outcome and backoff"""
+    if not os.path.exists(state_path()):
+        return {}
+    try:
+        with open(state_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading scheduler state: {str(e)}")
+        return {}
+
+def update_state(code, **values):
+    """Merge values into a country's state and save it using atomic write"""
+    with _state_lock:
+        state = load_state()
+        state.setdefault(code, {}).update(values)
+        try:
+            atomic_file.write_json(state_path(), state)
+        except Exception as e:
+            print(f"Error saving scheduler state: {str(e)}")
+    return state[code]
+
+def lock_path(code):
+    return os.path.join(SCHEDULER_DIR, f"{code}.lock")
+
+def acquire_run_lock(code):
+    """Claim a country across processes; False if another run holds it"""
+    os.makedirs(SCHEDULER_DIR, exist_ok=True)
+    path = lock_path(code)
+    try:
+        if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+            print(f"Removing stale run lock for {code}")
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"{os.getpid()} {datetime.now().isoformat()}")
+    return True
+
+def release_run_lock(code):
+    try:
+        os.unlink(lock_path(code))
+    except FileNotFoundError:
+        pass
+
+def last_completed_run(code):
+    """Start time of the latest completed run of a country's archive, or None"""
+    config = country_engine.get_country(code)
+    runs = [run for run in checkpoints.list_runs(config['code'], status='complete')
+            if run.get('module') == country_engine.pipeline_name(config)]
+    if not runs:
+        return None
+    try:
+        return datetime.strptime(runs[0]['run_id'], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+def is_overdue(code):
+    """Whether a country missed its last scheduled run (e.g. while the service was down)"""
+    last_run = last_completed_run(code)
+    return last_run is None or time.time() - last_run >= cadence_minutes(code) * 60
+
+def pipeline_providers(config):
+    """Providers a pipeline depends on"""
+    return [config['news']['provider'], 'serpapi', 'openai', config['tts']['provider']]
+
+def serpapi_searches_left():
+    """Searches left on the SerpApi plan (the account API is free), None if unknown"""
+    if not os.getenv('SERPAPI_KEY'):
+        return None
+    try:
+        response = provider_http.get(SERPAPI_ACCOUNT_URL, params={'api_key': os.getenv('SERPAPI_KEY')}, retries=0)
+        if response.status_code == 200:
+            return response.json().get('total_searches_left')
+    except Exception as e:
+        print(f"Error checking SerpApi quota: {str(e)}")
+    return None
+
+def quota_problem(config):
+    """Why a pipeline should not run now because of provider quotas, or None"""
+    for provider in pipeline_providers(config):
+        if provider_http.quota_low(provider, QUOTA_MIN_REMAINING):
+            return f"{provider} quota is low"
+    searches_left = serpapi_searches_left()
+    if searches_left is not None and searches_left < QUOTA_MIN_REMAINING:
+        return f"only {searches_left} SerpApi searches left"
+    return None
+
+def backoff_minutes(backoffs):
+    """Exponential delay for the n-th consecutive quota backoff"""
+    return min(BACKOFF_MAX_MINUTES, BACKOFF_BASE_MINUTES * (2 ** backoffs))
+
+def run_scheduled(code):
+    """Run one country unless it is already running, backing off or short on quota"""
+    with _running_lock:
+        local_lock = _running.setdefault(code, threading.Lock())
+    if not local_lock.acquire(blocking=False):
+        print(f"[{code}] Previous run still in progress, skipping")
+        return None
+    try:
+        if not acquire_run_lock(code):
+            print(f"[{code}] Another process is running this country, skipping")
+            return None
+        try:
+            state = load_state().get(code, {})
+            if state.get('backoff_until', 0) > time.time():
+                resume_at = datetime.fromtimestamp(state['backoff_until']).strftime("%H:%M")
+                print(f"[{code}] Backing off until {resume_at}")
+                return None
+
+            config = country_engine.get_country(code)
+            problem = quota_problem(config)
+            if problem:
+                backoffs = state.get('quota_backoffs', 0)
+                delay = backoff_minutes(backoffs)
+                print(f"[{code}] {problem}, backing off for {delay} minutes")
+                update_state(code, backoff_until=time.time() + delay * 60, quota_backoffs=backoffs + 1, last_skip_reason=problem)
+                return None
+
+            print(f"[{code}] Scheduled run starting")
+            start = time.monotonic()
+            try:
+                results = country_engine.fetch_trends(code)
+                error = None
+            except Exception as e:
+                results = None
+                error = str(e)
+            # An analysis that failed comes back as its error message
+            error_prefix = config['analysis']['error_prefix']
+            if results and results.get('analysis', '').startswith(error_prefix):
+                status, error = 'failed', results['analysis']
+            else:
+                status = 'ok' if results else ('failed' if error else 'no_data')
+            update_state(
+                code,
+                last_attempt=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                last_status=status,
+                last_error=error,
+                last_duration_seconds=round(time.monotonic() - start, 2),
+                backoff_until=0,
+                quota_backoffs=0
+            )
+            print(f"[{code}] Scheduled run finished: {status}")
+            return results
+        finally:
+            release_run_lock(code)
+    finally:
+        local_lock.release()
+
+def submit(executor, code):
+    """Hand a country's run to the worker pool, unless the scheduler is shutting down"""
+    try:
+        executor.submit(run_scheduled, code)
+    except RuntimeError:
+        print(f"[{code}] Scheduler is stopping, run not started")
+
+def start(codes=None):
+    """Schedule every country and run pending jobs until interrupted
+
+    Jobs run on worker threads, one per country, so a slow country never delays
+    the others. Countries that missed runs while the service was down are run
+    once right away.
+    """
+    codes = codes or [code for code, config in country_engine.COUNTRIES.items() if config.get('run_by_default', True)]
+    executor = ThreadPoolExecutor(max_workers=len(codes), thread_name_prefix='scheduled')
+    timers = []
+
+    for code in codes:
+        cadence = cadence_minutes(code)
+        jitter = max(1, int(cadence * JITTER_FRACTION))
+        schedule.every(cadence).to(cadence + jitter).minutes.do(submit, executor, code).tag(code)
+        print(f"{code}: every {cadence}-{cadence + jitter} minutes")
+        if is_overdue(code):
+            print(f"{code}: missed its last run, catching up")
+            # Spread catch-up runs over the first minute
+            timer = threading.Timer(random.uniform(0, 60), submit, args=(executor, code))
+            timer.daemon = True
+            timer.start()
+            timers.append(timer)
+
+    try:
+        while True:
+            schedule.run_pending()
+            idle = schedule.idle_seconds()
+            time.sleep(max(1, min(idle if idle is not None else 30, 30)))
+    except KeyboardInterrupt:
+        print("Stopping scheduler, waiting for running countries to finish")
+    finally:
+        # Catch-up runs that have not started yet are dropped
+        for timer in timers:
+            timer.cancel()
+        schedule.clear()
+        executor.shutdown(wait=True)
+
+def print_status(codes=None):
+    """Print each country's cadence, last completed run and scheduler state"""
+    state = load_state()
+    for code in codes or country_engine.COUNTRIES:
+        last_run = last_completed_run(code)
+        last = datetime.fromtimestamp(last_run).strftime("%Y-%m-%d %H:%M") if last_run else 'never'
+        entry = state.get(code, {})
+        line = f"{code:<11} every {cadence_minutes(code):>4} min  last completed: {last}"
+        if entry.get('last_status'):
+            line += f"  last attempt: {entry['last_status']}"
+        if entry.get('backoff_until', 0) > time.time():
+            line += f"  backing off until {datetime.fromtimestamp(entry['backoff_until']).strftime('%H:%M')}"
+        print(line)
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    requested = [arg.upper() for arg in sys.argv[2:]]
+    if command in ('run', 'status') and all(code in country_engine.COUNTRIES for code in requested):
+        if command == 'run':
+            start(requested)
+        else:
+            print_status(requested)
+    else:
+        print("\nUsage: python scheduler.py run [COUNTRY_CODE ...]     - refresh countries on their cadence (default: all)")
+        print("       python scheduler.py status [COUNTRY_CODE ...]  - show cadence, last runs and backoff")
+        print("\nCadence: SCHEDULE_MINUTES_<CODE> (default SCHEDULE_CADENCE_MINUTES, 180)")
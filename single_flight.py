@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+
+# Concurrent requests for the same pipeline share one in-flight run, and a
+# finished run is served to later requests for this many seconds (0 disables)
+FRESH_SECONDS = int(os.getenv('ANALYZE_FRESH_SECONDS', '600'))
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+class Flight:
+    def __init__(self, key):
+        """One pipeline run shared by every caller that asks for the same key
+
+        The run's stage and token callbacks are recorded as events, so each
+        caller can replay them with its own callbacks on its own thread.
+        """
+        self.key = key
+        self.events = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.finished_at = None
+        self._condition = threading.Condition()
+
+    def _record(self, kind, *args):
+        with self._condition:
+            self.events.append((kind, args))
+            self._condition.notify_all()
+
+    def _finish(self, result=None, error=None):
+        with self._condition:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.finished_at = time.time()
+            self._condition.notify_all()
+
+    def run(self, fetch_function):
+        """Run the pipeline, recording its progress"""
+        try:
+            result = fetch_function(
+                on_token=lambda piece: self._record('token', piece),
+                on_stage=lambda stage, data: self._record('stage', stage, data)
+            )
+        except Exception as e:
+            self._finish(error=e)
+        else:
+            self._finish(result=result)
+        if self.error is not None or not self.result:
+            # Failed runs are not served to later callers
+            with _flights_lock:
+                if _flights.get(self.key) is self:
+                    del _flights[self.key]
+
+    def is_fresh(self):
+        """Whether the flight is running, or finished successfully within FRESH_SECONDS"""
+        if not self.done:
+            return True
+        return self.error is None and bool(self.result) and time.time() - self.finished_at < FRESH_SECONDS
+
+    def follow(self, on_token=None, on_stage=None):
+        """Replay the run's events to the callbacks as they happen and return its result"""
+        position = 0
+        while True:
+            with self._condition:
+                while position == len(self.events) and not self.done:
+                    self._condition.wait()
+                events = self.events[position:]
+                position = len(self.events)
+                done = self.done
+            for kind, args in events:
+                if kind == 'token' and on_token:
+                    on_token(*args)
+                elif kind == 'stage' and on_stage:
+                    on_stage(*args)
+            if done and position == len(self.events):
+                break
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+def run(key, fetch_function, on_token=None, on_stage=None):
+    """Run fetch_function(on_token=..., on_stage=...) once for all concurrent callers of key
+
+    A caller arriving while a run for key is in flight joins it; one arriving
+    within FRESH_SECONDS of a successful run gets that run's result. Either way
+    the caller's callbacks see the run's progress. The run itself happens on a
+    background thread, so it finishes even if the caller that started it goes away.
+
+    Returns the pipeline's results; exceptions from the run are raised to every caller.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        started = flight is None or not flight.is_fresh()
+        if started:
+            flight = Flight(key)
+            _flights[key] = flight
+    if started:
+        threading.Thread(target=flight.run, args=(fetch_function,), name=f"flight-{key}", daemon=True).start()
+    elif flight.done:
+        print(f"Using {key} results from {int(time.time() - flight.finished_at)}s ago")
+    else:
+        print(f"Joining the {key} run already in progress")
+    return flight.follow(on_token=on_token, on_stage=on_stage)
+
+def forget(key):
+    """Drop a finished run so the next request for key starts a new one"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None and flight.done:
+            del _flights[key]
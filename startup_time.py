@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+
+# Modules whose cold import time matters: the Streamlit entry point, the
+# pipeline engine and the batch runner
+DEFAULT_MODULES = ['streamlit_app', 'country_engine', 'run_countries']
+
+# First use of each lazily built provider client, timed after the import
+FIRST_USE = {
+    'openai': "import country_engine; country_engine.get_openai_client()",
+    'newsapi': "import country_engine; country_engine.get_newsapi_client()",
+    'translator': "import translation; translation.get_translator('auto', 'en')"
+}
+
+def run_python(args):
+    """Run a fresh interpreter in this directory and return the completed process"""
+    env = dict(os.environ)
+    # Clients only need a key to be constructed; nothing is sent
+    env.setdefault('OPENAI_API_KEY', 'startup-time')
+    env.setdefault('NEWS_API_KEY', 'startup-time')
+    return subprocess.run(
+        [sys.executable] + args,
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (self_us, cumulative_us, name) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+def measure_import(module):
+    """Cold import of module in a fresh interpreter
+
+    Returns {'module', 'total_ms', 'packages'} where packages maps each top-level
+    package to the milliseconds spent importing it, or None if the import failed.
+    """
+    result = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    if result.returncode != 0:
+        print(f"Error importing {module}: {result.stderr.strip().splitlines()[-1]}")
+        return None
+    rows = parse_importtime(result.stderr)
+    packages = {}
+    for self_us, _, name in rows:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    total = next((cumulative for _, cumulative, name in rows if name == module), 0) / 1000
+    return {'module': module, 'total_ms': total, 'packages': packages}
+
+def measure_first_use(name):
+    """Milliseconds to import what a provider client needs and build it, in a fresh interpreter"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{FIRST_USE[name]}; "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    result = run_python(['-c', code])
+    if result.returncode != 0:
+        print(f"Error building {name} client: {result.stderr.strip().splitlines()[-1]}")
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+def print_report(measurement, top=8):
+    """Print total import time and the slowest packages"""
+    print(f"\n{measurement['module']}: {measurement['total_ms']:.0f} ms")
+    slowest = sorted(measurement['packages'].items(), key=lambda item: item[1], reverse=True)[:top]
+    for package, ms in slowest:
+        print(f"  {package:<24} {ms:>8.1f} ms")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print("\nUsage: python startup_time.py [--first-use] [MODULE ...]")
+        print("\nMeasures cold import time of each module in a fresh interpreter (default: "
+              f"{', '.join(DEFAULT_MODULES)})")
+        print("--first-use also times the first use of each lazily built provider client")
+    else:
+        first_use = '--first-use' in args
+        modules = [arg for arg in args if arg != '--first-use'] or DEFAULT_MODULES
+        for module in modules:
+            measurement = measure_import(module)
+            if measurement:
+                print_report(measurement)
+        if first_use:
+            print("\nFirst use (import + client construction):")
+            for name in FIRST_USE:
+                ms = measure_first_use(name)
+                if ms is not None:
+                    print(f"  {name:<24} {ms:>8.1f} ms")
@@ -1,8 +1,92 @@
+import os
+import importlib
 import streamlit as st
-from israel_trends import fetch_trends as fetch_israel_trends
-from lebanon_trends import fetch_trends as fetch_lebanon_trends
-from iran_trends import fetch_trends as fetch_iran_trends
-from czech_trends import fetch_trends as fetch_czech_trends
+import single_flight
+
+def load_fetch_function(module_name):
+    """Import a country pipeline on first use, so app startup skips the provider SDKs"""
+    return importlib.import_module(module_name).fetch_trends
+
+def render_headlines(headlines):
+    """Render the headline list"""
+    st.header("📰 Official Headlines")
+    if headlines:
+        for headline in headlines:
+            st.markdown(f"• {headline}")
+    else:
+        st.info("No recent headlines found")
+
+def render_trends(trends_data):
+    """Render trends with their related searches"""
+    st.header("🔍 What People Search For")
+    for trend in trends_data:
+        with st.expander(f"**{trend['title']}**", expanded=True):
+            if trend['related']:
+                st.markdown("Related searches:")
+                for related in trend['related']:
+                    st.markdown(f"• {related}")
+            else:
+                st.info("No related searches found")
+
+def render_analysis(analysis, in_progress=False):
+    """Render the analysis, with a cursor while it is still being written"""
+    st.markdown("---")
+    st.header("🎭 The Reality Behind the Headlines")
+    st.markdown(analysis + (" ▌" if in_progress else ""))
+
+def run_with_progress(module_name, container):
+    """Run a pipeline, rendering each stage into container as soon as it is ready
+
+    Sessions analyzing the same country at the same time share one run, and a
+    recent run is reused for ANALYZE_FRESH_SECONDS (see single_flight.py).
+    """
+    with container.container():
+        news_col, trends_col = st.columns(2)
+        headlines_box = news_col.empty()
+        trends_box = trends_col.empty()
+        analysis_box = st.empty()
+        audio_box = st.empty()
+
+    trends_box.info("Fetching trending searches...")
+    analysis_pieces = []
+    audio = {}
+
+    def show_stage(stage, data):
+        if stage == 'headlines':
+            with headlines_box.container():
+                render_headlines(data)
+        elif stage == 'trends':
+            with trends_box.container():
+                st.header("🔍 What People Search For")
+                st.caption(f"Picking the most telling of {len(data)} trending searches...")
+                for trend in data:
+                    st.markdown(f"• {trend['title']}")
+        elif stage == 'selection':
+            with headlines_box.container():
+                render_headlines(data['headlines'])
+            with trends_box.container():
+                render_trends(data['trends_data'])
+            analysis_box.info("Writing the analysis...")
+        elif stage == 'analysis':
+            with analysis_box.container():
+                render_analysis(data)
+            audio_box.info("Generating audio...")
+        elif stage == 'audio':
+            audio['path'] = data
+            audio_box.empty()
+
+    def show_analysis_progress(piece):
+        analysis_pieces.append(piece)
+        with analysis_box.container():
+            render_analysis(''.join(analysis_pieces), in_progress=True)
+
+    results = single_flight.run(
+        module_name,
+        lambda **callbacks: load_fetch_function(module_name)(**callbacks),
+        on_token=show_analysis_progress,
+        on_stage=show_stage
+    )
+    return results, audio.get('path')
 
 def main():
     st.set_page_config(
@@ -14,12 +98,12 @@ def main():
     st.title("🔍 Official News vs. Real Searches")
     st.markdown("### Revealing the Gap Between Headlines and Reality")
 
-    # Country selector with flags
+    # Country selector with flags; pipelines are imported when first analyzed
     country_options = {
-        "Israel": ("IL", "🇮🇱", fetch_israel_trends),
-        "Lebanon": ("LB", "🇱🇧", fetch_lebanon_trends),
-        "Iran": ("IR", "🇮🇷", fetch_iran_trends),
-        "Czech Republic": ("CZ", "🇨🇿", fetch_czech_trends)
+        "Israel": ("IL", "🇮🇱", "israel_trends"),
+        "Lebanon": ("LB", "🇱🇧", "lebanon_trends"),
+        "Iran": ("IR", "🇮🇷", "iran_trends"),
+        "Czech Republic": ("CZ", "🇨🇿", "czech_trends")
     }
 
     # Create two columns for layout
@@ -32,60 +116,55 @@ def main():
             format_func=lambda x: f"{country_options[x][1]} {x}"
         )
 
-        # Get country code and fetch function
-        country_code, flag, fetch_function = country_options[country]
-        
+        # Get country code and pipeline module
+        country_code, flag, module_name = country_options[country]
+
         if st.button(f"Analyze {flag} {country}", use_container_width=True):
+            # Stages are shown in the results column while the run is in flight
+            progress = col2.empty()
             with st.spinner(f"Analyzing {country}..."):
                 # Run the analysis
                 try:
-                    results = fetch_function()
-                    
+                    results, audio_path = run_with_progress(module_name, progress)
+
                     if results and 'trends_data' in results:
                         st.session_state.results = results
                         st.session_state.current_country = country
                         st.session_state.current_flag = flag
                         st.session_state.current_code = country_code
+                        st.session_state.audio_path = audio_path
                     else:
                         st.error(f"No data found for {country}")
-                    
+
                 except Exception as e:
                     st.error(f"An error occurred: {str(e)}")
 
+            # The full results are rendered below once the run is complete
+            progress.empty()
+
     with col2:
         if 'results' in st.session_state and 'current_country' in st.session_state:
             results = st.session_state.results
             country = st.session_state.current_country
             flag = st.session_state.current_flag
             code = st.session_state.current_code
-            
+
             # Create two columns for comparison
             news_col, trends_col = st.columns(2)
-            
+
             with news_col:
-                st.header("📰 Official Headlines")
-                if 'headlines' in results and results['headlines']:
-                    for headline in results['headlines']:
-                        st.markdown(f"• {headline}")
-                else:
-                    st.info("No recent headlines found")
-            
+                render_headlines(results.get('headlines'))
+
             with trends_col:
-                st.header("🔍 What People Search For")
-                for trend in results['trends_data']:
-                    with st.expander(f"**{trend['title']}**", expanded=True):
-                        if trend['related']:
-                            st.markdown("Related searches:")
-                            for related in trend['related']:
-                                st.markdown(f"• {related}")
-                        else:
-                            st.info("No related searches found")
-            
+                render_trends(results['trends_data'])
+
             # Show analysis if available
             if 'analysis' in results and results['analysis']:
-                st.markdown("---")
-                st.header("🎭 The Reality Behind the Headlines")
-                st.markdown(results['analysis'])
+                render_analysis(results['analysis'])
+
+            audio_path = st.session_state.get('audio_path')
+            if audio_path and os.path.exists(audio_path):
+                st.audio(audio_path, format='audio/mp3')
 
     # Add navigation hint
     st.sidebar.markdown("→ View historical analyses in the Archive page")
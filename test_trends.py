@@ -1,24 +1,20 @@
 import sys
 import time
 from datetime import datetime, timedelta
-from deep_translator import GoogleTranslator
-import warnings
-import requests
+from translation import translate
 import json
-import os
-from openai import OpenAI
 from dotenv import load_dotenv
 import textwrap
-from newsapi import NewsApiClient
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import provider_http
+import llm
+import country_engine
+import tts
 
 # Load environment variables
 load_dotenv()
 
-# Initialize clients
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-newsapi = NewsApiClient(api_key=os.getenv('NEWS_API_KEY'))
-
 # Country configurations
 COUNTRY_CONFIGS = {
     'IL': {
@@ -33,50 +29,15 @@ COUNTRY_CONFIGS = {
     }
 }
 
-# News sources to filter out
-NEWS_SOURCES = {
-    'cnn', 'bbc', 'fox news', 'nyt', 'new york times',
-    'reuters', 'associated press', 'ap news'
-}
-
-JOURNALIST_PERSONA = """You're a journalist with the biting wit of Christopher Hitchens, tasked with analyzing the collective psyche through search trends. Your unique talent lies in using these digital footprints—what people search for in private—to expose the raw, unfiltered reality beneath official narratives.
-
-Your job is to decode these search patterns like a psychological X-ray, revealing the true preoccupations, fears, and absurdities that occupy people's minds while the state trumpets its grand narratives. Use dark humor and sharp insight to contrast the public face of events with the private thoughts revealed through search trends, showing how these digital confessions often tell a more honest story than any official report."""
+# Shared with the country pipelines, as are the OpenAI and NewsAPI clients
+NEWS_SOURCES = country_engine.NEWS_SOURCES
+JOURNALIST_PERSONA = country_engine.JOURNALIST_PERSONA
 
 def generate_audio(text):
     """Generate audio using ElevenLabs text-to-speech"""
     try:
-        # ElevenLabs API endpoint
-        url = "https://api.elevenlabs.io/v1/text-to-speech/TxGEqnHWrfWFTfGW9XjX"  # Josh voice ID
-        
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": os.getenv('ELEVENLABS_API_KEY')
-        }
-        
-        data = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.5
-            }
-        }
-        
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            # Save audio to file
-            audio_file = "analysis.mp3"
-            with open(audio_file, "wb") as f:
-                f.write(response.content)
-            return True
-            
-        else:
-            print(f"Error: API request failed with status code {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
+        audio_file = "analysis.mp3"
+        return tts.elevenlabs_tts(text, audio_file, "TxGEqnHWrfWFTfGW9XjX", "eleven_monolingual_v1")  # Josh voice
             
     except Exception as e:
         print(f"Error with text-to-speech: {str(e)}")
@@ -96,7 +57,7 @@ def get_current_news(country_code):
         start_date = end_date - timedelta(days=1)
         
         # Search for country-related news
-        headlines = newsapi.get_everything(
+        headlines = country_engine.get_newsapi_client().get_everything(
             q=config['news_query'],
             language='en',
             sort_by='relevancy',
@@ -142,16 +103,14 @@ def translate_text(text, country_code):
             
         # Try translation from country's language to English
         config = COUNTRY_CONFIGS[country_code]
-        translator = GoogleTranslator(source=config['lang_code'], target='en')
         try:
-            result = translator.translate(text)
+            result = translate(text, source=config['lang_code'], target='en')
             if result and result != text:
                 print(f"Translated: {text} -> {result}")
                 return result
         except:
             # Fallback to auto-detect if specific language translation fails
-            translator = GoogleTranslator(source='auto', target='en')
-            result = translator.translate(text)
+            result = translate(text, source='auto', target='en')
             print(f"Translated (auto): {text} -> {result}")
             return result
     except Exception as e:
@@ -174,7 +133,7 @@ def get_suggestions(keyword, country_code):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/94.0'
         }
         
-        response = requests.get(url, params=params, headers=headers)
+        response = provider_http.get(url, params=params, headers=headers)
         if response.status_code == 200:
             data = json.loads(response.text)
             if len(data) > 1 and isinstance(data[1], list):
@@ -212,16 +171,7 @@ Write a brief, biting analysis (2 paragraphs) that:
 Keep it sharp and psychologically insightful, treating the search trends as a collective Rorschach test that reveals uncomfortable truths. Each paragraph should be a single continuous line."""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": JOURNALIST_PERSONA},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=500
-        )
-        return clean_text(response.choices[0].message.content)
+        return clean_text(llm.chat(country_engine.get_openai_client(), "gpt-4", JOURNALIST_PERSONA, prompt, temperature=0.8, max_tokens=500))
     except Exception as e:
         return f"Error generating analysis: {str(e)}"
 
@@ -229,7 +179,7 @@ def get_trending_searches(country_code):
     """Get trending searches from Google Trends RSS feed"""
     try:
         url = f"https://trends.google.com/trending/rss?geo={country_code}"
-        response = requests.get(url)
+        response = provider_http.get(url)
         if response.status_code == 200:
             # Parse XML
             root = ET.fromstring(response.content)
@@ -247,11 +197,12 @@ def get_trending_searches(country_code):
 def fetch_trends(country_code):
     """Fetch trends and news, then generate analysis"""
     try:
-        # Get current news
-        headlines = get_current_news(country_code)
-        
-        # Get trending searches
-        trending_searches = get_trending_searches(country_code)
+        # News and trending searches are independent requests, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            news_future = executor.submit(get_current_news, country_code)
+            trends_future = executor.submit(get_trending_searches, country_code)
+        headlines = news_future.result()
+        trending_searches = trends_future.result()
         if trending_searches:
             trends_data = []
             processed_trends = set()
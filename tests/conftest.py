@@ -0,0 +1,10 @@
+import threading
+import pytest
+import audio_jobs
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    """Empty audio job queue whose workers never start"""
+    monkeypatch.setattr(audio_jobs, 'AUDIO_JOBS_PATH', str(tmp_path / 'jobs' / 'audio_jobs.sqlite3'))
+    monkeypatch.setattr(audio_jobs, '_local', threading.local())
+    monkeypatch.setattr(audio_jobs, 'ensure_workers', lambda count=None: None)
@@ -0,0 +1,52 @@
+import asyncio
+import aiohttp
+import pytest
+import async_providers
+import checkpoints
+import country_engine
+import translation
+from disk_cache import DiskCache
+
+class FailingClient(async_providers.AsyncProviderClient):
+    """Client whose every request fails like an unreachable provider"""
+    async def request(self, method, url, provider=None, **kwargs):
+        raise aiohttp.ClientConnectionError("connection refused")
+
+class TranslatingClient(async_providers.AsyncProviderClient):
+    """Client whose Google Translate upper-cases text and counts requests"""
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    async def _google_translate(self, text, source, target):
+        self.requests.append(text)
+        return text.upper()
+
+def test_provider_errors_return_no_data_like_the_sync_engine():
+    client = FailingClient()
+    for code in ('LB', 'IL2', 'CZ'):
+        config = country_engine.get_country(code)
+        assert asyncio.run(async_providers.fetch_headlines(client, config)) == []
+        assert asyncio.run(async_providers.fetch_trending(client, config)) == []
+
+def test_translate_batch_shares_the_translation_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation, '_cache', DiskCache(str(tmp_path / 'translations.sqlite3')))
+    translation.store_cached('cached', 'ar', 'en', 'FROM CACHE')
+    client = TranslatingClient()
+    assert asyncio.run(client.translate_batch(['one', 'cached', 'two', 'one'], source='ar')) == ['ONE', 'FROM CACHE', 'TWO', 'ONE']
+    assert client.requests == ['one\ntwo']
+    assert translation.get_cached('two', 'ar', 'en') == 'TWO'
+    assert asyncio.run(client.translate('two', source='ar')) == 'TWO'
+    assert client.requests == ['one\ntwo']
+
+@pytest.mark.parametrize('valid', [True, False])
+def test_run_stage_saves_only_valid_results(tmp_path, monkeypatch, valid):
+    monkeypatch.setattr(checkpoints, 'CHECKPOINT_DIR', str(tmp_path))
+    checkpoint = checkpoints.RunCheckpoint('XX', 'fake_pipeline')
+
+    async def compute():
+        return ['headline'] if valid else []
+
+    assert asyncio.run(async_providers.run_stage(checkpoint, 'headlines', compute)) == (['headline'] if valid else [])
+    assert checkpoint.get('headlines') == (['headline'] if valid else None)
+    assert ('headlines' in checkpoint.data['errors']) is not valid
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import types
+import pytest
+import audio_jobs
+import checkpoints
+
+class Pipeline:
+    """Two-stage pipeline registered as a module, so checkpoints.resume can import it"""
+    def __init__(self):
+        self.calls = {'headlines': 0, 'analysis': 0}
+        self.fail_analysis = True
+
+    def headlines(self):
+        self.calls['headlines'] += 1
+        return ['headline']
+
+    def analysis(self):
+        self.calls['analysis'] += 1
+        if self.fail_analysis:
+            raise RuntimeError("OpenAI unavailable")
+        return 'analysis'
+
+    def fetch_trends(self, run_id=None, reuse_previous=True):
+        checkpoint = checkpoints.RunCheckpoint('XX', 'fake_pipeline', run_id=run_id)
+        checkpoint.run('headlines', self.headlines)
+        result = checkpoint.run('analysis', self.analysis)
+        checkpoint.complete()
+        return result
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoints, 'CHECKPOINT_DIR', str(tmp_path))
+    fake = Pipeline()
+    module = types.ModuleType('fake_pipeline')
+    module.fetch_trends = fake.fetch_trends
+    monkeypatch.setitem(sys.modules, 'fake_pipeline', module)
+    return fake
+
+def write_run(directory, run_id, status, age_days=0, stages=None):
+    path = os.path.join(directory, 'XX', f"{run_id}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'run_id': run_id, 'code': 'XX', 'module': 'fake_pipeline', 'status': status,
+                   'stages': stages or {}, 'errors': {}}, f)
+    if age_days:
+        old = time.time() - age_days * 24 * 3600
+        os.utime(path, (old, old))
+    return path
+
+def test_resume_reruns_only_missing_stages(pipeline):
+    with pytest.raises(RuntimeError):
+        pipeline.fetch_trends()
+    [run] = checkpoints.list_runs('XX')
+    assert run['status'] == 'incomplete'
+    assert list(run['stages']) == ['headlines']
+    assert 'analysis' in run['errors']
+
+    pipeline.fail_analysis = False
+    assert checkpoints.resume('XX') == 'analysis'
+    assert pipeline.calls == {'headlines': 1, 'analysis': 2}
+    [run] = checkpoints.list_runs('XX')
+    assert run['status'] == 'complete'
+    assert run['errors'] == {}
+    assert checkpoints.resume('XX') is None
+
+def test_invalid_stage_output_is_not_saved(pipeline):
+    checkpoint = checkpoints.RunCheckpoint('XX', 'fake_pipeline')
+    assert checkpoint.run('headlines', lambda: []) == []
+    assert checkpoint.get('headlines') is None
+    assert checkpoint.data['status'] == 'incomplete'
+    assert checkpoint.run('headlines', lambda: ['headline']) == ['headline']
+    assert checkpoint.run('headlines', lambda: ['other']) == ['headline']
+
+def test_resume_skips_finished_runs(pipeline, tmp_path):
+    write_run(str(tmp_path), '20250101_100000', 'running')
+    write_run(str(tmp_path), '20250102_100000', 'no_data')
+    write_run(str(tmp_path), '20250103_100000', 'complete')
+    pipeline.fail_analysis = False
+    checkpoints.resume('XX')
+    statuses = {run['run_id']: run['status'] for run in checkpoints.list_runs('XX')}
+    assert statuses == {'20250101_100000': 'complete', '20250102_100000': 'no_data', '20250103_100000': 'complete'}
+
+def test_prune_removes_old_runs_whatever_their_status(pipeline, tmp_path):
+    old = [write_run(str(tmp_path), f"2025010{day}_100000", status, age_days=30)
+           for day, status in enumerate(['complete', 'running', 'incomplete', 'no_data'], 1)]
+    recent = write_run(str(tmp_path), '20250110_100000', 'incomplete')
+    checkpoints.prune('XX')
+    assert not any(os.path.exists(path) for path in old)
+    assert os.path.exists(recent)
+
+def test_failed_audio_job_makes_complete_run_resumable(pipeline, jobs, tmp_path):
+    audio_file = str(tmp_path / 'XX_20250101_100000_analysis.mp3')
+    job_id = audio_jobs.enqueue('fake_pipeline', 'analysis', '20250101_100000')
+    stages = {'audio': {'data': {'audio_file': audio_file, 'job_id': job_id}, 'at': 0}}
+    write_run(str(tmp_path), '20250101_100000', 'complete', stages=stages)
+    [run] = checkpoints.list_runs('XX')
+    assert not checkpoints.needs_resume(run)
+
+    job = audio_jobs.claim_next()
+    job['attempts'] = audio_jobs.MAX_ATTEMPTS
+    audio_jobs.mark_failed(job, "TTS unavailable")
+    assert checkpoints.needs_resume(run)
+
+    open(audio_file, 'wb').close()
+    assert not checkpoints.needs_resume(run)
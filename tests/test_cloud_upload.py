@@ -0,0 +1,87 @@
+import json
+import pytest
+from google.api_core.exceptions import NotFound, PreconditionFailed
+import cloud_storage
+import cloud_upload
+
+class Blob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.etag = None
+        self.generation = None
+
+    def download_as_bytes(self, if_etag_not_match=None):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        data, self.generation = self.bucket.objects[self.name]
+        self.etag = str(self.generation)
+        return data
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        hook = self.bucket.before_write.pop(self.name, None)
+        if hook:
+            hook()
+        current = self.bucket.objects.get(self.name, (None, 0))[1]
+        if if_generation_match is not None and current != if_generation_match:
+            raise PreconditionFailed(self.name)
+        self.bucket.generation += 1
+        self.bucket.objects[self.name] = (data.encode() if isinstance(data, str) else data, self.bucket.generation)
+
+    def upload_from_filename(self, path, content_type=None):
+        with open(path, 'rb') as f:
+            self.upload_from_string(f.read())
+
+class Bucket:
+    """In-memory bucket with generation preconditions
+
+    before_write maps a blob name to a callable run once just before its next
+    write, to simulate another writer landing in between.
+    """
+    def __init__(self):
+        self.objects = {}
+        self.generation = 0
+        self.before_write = {}
+
+    def blob(self, name):
+        return Blob(self, name)
+
+class Client:
+    def __init__(self):
+        self.shared_bucket = Bucket()
+
+    def bucket(self, name):
+        return self.shared_bucket
+
+    def list_blobs(self, bucket_name, prefix='', max_results=None):
+        names = sorted(name for name in self.shared_bucket.objects if name.startswith(prefix))
+        return [Blob(self.shared_bucket, name) for name in names][:max_results]
+
+def log_entry(timestamp):
+    return {'json': 'text_archive/IL2/IL2_20250126_log.json', 'timestamp': timestamp, 'audio': None}
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Bucket whose manifest lists the 10:00 run of 2025-01-26, and that run's audio file"""
+    storage = cloud_storage.CloudStorage(storage_client=Client())
+    monkeypatch.setattr(cloud_upload, '_storage', storage)
+    storage.update_manifest({'20250126': log_entry('20250126_100000')})
+    audio_path = tmp_path / 'IL2_20250126_100000_analysis.mp3'
+    audio_path.write_bytes(b'mp3')
+    storage.audio_task = ('audio', 'IL2', '20250126_100000', str(audio_path))
+    return storage
+
+def manifest_dates(storage):
+    return json.loads(storage.bucket.objects[cloud_storage.MANIFEST_BLOB][0])['dates']
+
+def test_audio_is_attached_to_its_own_run(storage):
+    cloud_upload.upload(storage.audio_task)
+    assert manifest_dates(storage)['20250126']['audio'] == 'audio/IL2/IL2_20250126_100000_analysis.mp3'
+
+def test_audio_is_not_attached_to_a_later_run_that_lands_during_the_update(storage):
+    # A later run's log is recorded between the audio upload's manifest read and its write
+    later = log_entry('20250126_120000')
+    storage.bucket.before_write[cloud_storage.MANIFEST_BLOB] = lambda: storage.update_manifest({'20250126': later})
+    cloud_upload.upload(storage.audio_task)
+    assert manifest_dates(storage)['20250126'] == later
+    assert 'audio/IL2/IL2_20250126_100000_analysis.mp3' in storage.bucket.objects
@@ -0,0 +1,19 @@
+import run_countries
+import country_engine
+
+def report(code, results=None, error=None):
+    return run_countries.build_country_report(code, '2025-01-01 10:00:00', 1.0, results, error)
+
+def test_successful_run_is_ok():
+    result = report('LB', {'headlines': ['a', 'b'], 'trends_data': [{'title': 't'}], 'analysis': 'An analysis.'})
+    assert (result['status'], result['error'], result['headlines'], result['trends']) == ('ok', None, 2, 1)
+
+def test_error_analysis_is_an_error():
+    message = f"{country_engine.get_country('LB')['analysis']['error_prefix']}: rate limited"
+    result = report('LB', {'headlines': ['a'], 'trends_data': [{'title': 't'}], 'analysis': message})
+    assert (result['status'], result['error']) == ('error', message)
+    assert run_countries.build_run_report('run', [result], 1.0)['succeeded'] == 0
+
+def test_no_results_and_exceptions():
+    assert report('LB')['status'] == 'no_data'
+    assert report('LB', error='boom')['status'] == 'error'
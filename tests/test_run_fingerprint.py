@@ -0,0 +1,49 @@
+import os
+import pytest
+import audio_jobs
+import country_engine
+import run_fingerprint
+
+HEADLINES = ['Cabinet approves the budget', 'Storm closes the coastal road']
+TRENDS = [{'title': 'budget vote', 'related': ['finance minister']}, {'title': 'storm', 'related': []}]
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """Run from an empty archive with a saved LB run"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_fingerprint, 'TEXT_ARCHIVE_DIR', os.path.join('archive', 'text_archive'))
+    config = country_engine.get_country('LB')
+    timestamp = run_fingerprint.datetime.now().strftime("%Y%m%d_%H%M%S")
+    country_engine.save_analysis_log(config, HEADLINES, TRENDS, 'Saved analysis', timestamp)
+    return config, timestamp
+
+def test_reuse_returns_saved_audio(archive, jobs):
+    config, timestamp = archive
+    fingerprint = run_fingerprint.build_fingerprint(HEADLINES, TRENDS)
+    audio = {'audio_file': country_engine.get_audio_path(config, timestamp), 'job_id': 7}
+    run_fingerprint.save_latest('LB', fingerprint, timestamp, audio)
+
+    previous = run_fingerprint.find_reusable_run('LB', fingerprint)
+    assert previous['analysis'] == 'Saved analysis'
+    assert previous['audio'] == audio
+
+def test_old_fingerprints_fall_back_to_the_audio_path(archive, jobs):
+    config, timestamp = archive
+    fingerprint = run_fingerprint.build_fingerprint(HEADLINES, TRENDS)
+    run_fingerprint.save_latest('LB', fingerprint, timestamp)
+    previous = run_fingerprint.find_reusable_run('LB', fingerprint)
+    assert previous['audio'] == {'audio_file': country_engine.get_audio_path(config, timestamp), 'job_id': None}
+
+def test_reused_run_with_missing_audio_is_queued_again(archive, jobs, monkeypatch):
+    config, timestamp = archive
+    monkeypatch.setattr(audio_jobs, 'AUDIO_BACKGROUND', True)
+    fingerprint = run_fingerprint.build_fingerprint(HEADLINES, TRENDS)
+    run_fingerprint.save_latest('LB', fingerprint, timestamp, {'audio_file': country_engine.get_audio_path(config, timestamp), 'job_id': None})
+
+    previous = run_fingerprint.find_reusable_run('LB', fingerprint)
+    audio = country_engine.reused_audio(config, previous)
+    job = audio_jobs.get_job(audio['job_id'])
+    assert (job['module'], job['timestamp'], job['text'], job['status']) == (country_engine.pipeline_name(config), timestamp, 'Saved analysis', 'queued')
+    # A queued job is not queued twice
+    assert country_engine.reused_audio(config, dict(previous, audio=audio)) == audio
+    assert len(audio_jobs.list_jobs()) == 1
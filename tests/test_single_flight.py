@@ -0,0 +1,85 @@
+import threading
+import pytest
+import single_flight
+
+class Pipeline:
+    """fetch_function that blocks until released and counts its runs"""
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, on_token=None, on_stage=None):
+        self.calls += 1
+        self.started.set()
+        on_stage('headlines', ['a'])
+        self.release.wait(5)
+        on_token('Hello')
+        if self.error:
+            raise self.error
+        return {'analysis': 'Hello'}
+
+def call(key, pipeline, outcomes):
+    """Run single_flight.run on a thread, recording its tokens and result or exception"""
+    outcome = {'tokens': [], 'stages': []}
+    outcomes.append(outcome)
+    def target():
+        try:
+            outcome['result'] = single_flight.run(
+                key, pipeline,
+                on_token=outcome['tokens'].append,
+                on_stage=lambda stage, data: outcome['stages'].append(stage)
+            )
+        except Exception as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+@pytest.fixture
+def key(request):
+    yield request.node.name
+    single_flight.forget(request.node.name)
+
+def test_concurrent_callers_share_one_run(key):
+    pipeline = Pipeline()
+    outcomes = []
+    threads = [call(key, pipeline, outcomes)]
+    assert pipeline.started.wait(5)
+    threads += [call(key, pipeline, outcomes) for _ in range(2)]
+    pipeline.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert pipeline.calls == 1
+    for outcome in outcomes:
+        assert outcome['result'] == {'analysis': 'Hello'}
+        assert outcome['tokens'] == ['Hello']
+        assert outcome['stages'] == ['headlines']
+
+def test_fresh_result_is_reused_until_forgotten(key):
+    pipeline = Pipeline()
+    pipeline.release.set()
+    assert single_flight.run(key, pipeline) == single_flight.run(key, pipeline)
+    assert pipeline.calls == 1
+    single_flight.forget(key)
+    single_flight.run(key, pipeline)
+    assert pipeline.calls == 2
+
+def test_error_reaches_every_caller_and_is_not_cached(key):
+    pipeline = Pipeline(error=ValueError("quota exceeded"))
+    outcomes = []
+    threads = [call(key, pipeline, outcomes)]
+    assert pipeline.started.wait(5)
+    threads.append(call(key, pipeline, outcomes))
+    pipeline.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert pipeline.calls == 1
+    for outcome in outcomes:
+        assert isinstance(outcome['error'], ValueError)
+        assert 'result' not in outcome
+
+    with pytest.raises(ValueError):
+        single_flight.run(key, pipeline)
+    assert pipeline.calls == 2
@@ -0,0 +1,62 @@
+import pytest
+import translation
+from disk_cache import DiskCache
+
+class FakeTranslator:
+    """Upper-cases text; drop_line makes batched requests lose their last line"""
+    def __init__(self):
+        self.requests = []
+        self.drop_line = False
+        self.fail_batches = False
+
+    def translate(self, text):
+        self.requests.append(text)
+        batched = translation.BATCH_SEPARATOR in text
+        if batched and self.fail_batches:
+            raise RuntimeError("request failed")
+        lines = text.upper().split(translation.BATCH_SEPARATOR)
+        if batched and self.drop_line:
+            lines = lines[:-1]
+        return translation.BATCH_SEPARATOR.join(lines)
+
+@pytest.fixture
+def translator(tmp_path, monkeypatch):
+    """Fake Google translator used by translation, with an empty translation cache"""
+    fake = FakeTranslator()
+    monkeypatch.setattr(translation, '_cache', DiskCache(str(tmp_path / 'translations.sqlite3')))
+    monkeypatch.setattr(translation, 'get_translator', lambda source, target: fake)
+    return fake
+
+def test_pack_batches_respects_size_limit(monkeypatch):
+    monkeypatch.setattr(translation, 'BATCH_MAX_CHARS', 10)
+    assert translation.pack_batches(['aaaa', 'bbbb', 'cccc', 'dddddddddddd']) == [['aaaa', 'bbbb'], ['cccc'], ['dddddddddddd']]
+    assert translation.pack_batches([]) == []
+
+def test_unpack_batch():
+    assert translation.unpack_batch(['a', 'b'], ' A \nB') == ['A', 'B']
+    assert translation.unpack_batch(['a', 'b', 'c'], 'A\nB') is None
+    assert translation.unpack_batch(['a'], 'A\nB') is None
+    assert translation.unpack_batch(['a'], '') is None
+
+def test_is_packable():
+    assert translation.is_packable('one line')
+    assert not translation.is_packable('two\nlines')
+
+def test_translate_batch_uses_one_request(translator):
+    assert translation.translate_batch(['one', 'two', 'one', ''], source='he') == ['ONE', 'TWO', 'ONE', '']
+    assert translator.requests == ['one\ntwo']
+
+def test_translate_batch_falls_back_to_single_requests(translator):
+    translator.drop_line = True
+    assert translation.translate_batch(['one', 'two', 'three']) == ['ONE', 'TWO', 'THREE']
+    assert translator.requests == ['one\ntwo\nthree', 'one', 'two', 'three']
+
+def test_translate_batch_falls_back_after_request_error(translator):
+    translator.fail_batches = True
+    assert translation.translate_batch(['one', 'two']) == ['ONE', 'TWO']
+    assert translator.requests == ['one\ntwo', 'one', 'two']
+
+def test_translate_batch_serves_cache_and_unpackable_texts(translator):
+    translation.translate_batch(['one'])
+    assert translation.translate_batch(['one', 'two\nlines']) == ['ONE', 'TWO\nLINES']
+    assert translator.requests == ['one', 'two\nlines']
@@ -0,0 +1,124 @@
+import io
+import tts
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 144 * 128000 // 44100 = 417 bytes per frame
+FRAME_LENGTH = 417
+
+def frame(fill=b'\x00', padding=False, mono=False, tag=None, tag_offset=None):
+    """One MPEG-1 Layer III frame, optionally carrying a VBR tag"""
+    header = bytes([0xFF, 0xFB, 0x92 if padding else 0x90, 0xC0 if mono else 0x00])
+    body = bytearray(fill * (FRAME_LENGTH + padding - 4))
+    if tag:
+        offset = tag_offset if tag_offset is not None else (17 if mono else 32)
+        body[offset:offset + 4] = tag
+    return header + bytes(body)
+
+def id3v2(size, footer=False):
+    """ID3v2 tag of size bytes after the header (syncsafe size)"""
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    tag = b'ID3\x04\x00' + bytes([0x10 if footer else 0x00]) + syncsafe + b'\x00' * size
+    return tag + (b'3DI' + b'\x00' * 7 if footer else b'')
+
+def id3v1():
+    return b'TAG' + b'\x00' * 125
+
+def bounds(data):
+    return tts._frame_bounds(lambda offset, length: data[offset:offset + length], len(data))
+
+def test_first_frame_length():
+    assert tts._first_frame_length(frame()) == FRAME_LENGTH
+    assert tts._first_frame_length(frame(padding=True)) == FRAME_LENGTH + 1
+    assert tts._first_frame_length(b'ID3\x04') is None
+    assert tts._first_frame_length(b'\xFF\xFB\xF0\x00') is None  # bad bitrate index
+
+def test_plain_audio_is_kept_whole():
+    audio = frame(b'\x01') + frame(b'\x02')
+    assert bounds(audio) == (0, len(audio))
+
+def test_id3v2_header_is_skipped():
+    audio = frame(b'\x01')
+    assert bounds(id3v2(300) + audio) == (310, 310 + len(audio))
+
+def test_id3v2_footer_is_skipped():
+    audio = frame(b'\x01')
+    assert bounds(id3v2(300, footer=True) + audio) == (320, 320 + len(audio))
+
+def test_id3v1_trailer_is_dropped():
+    audio = frame(b'\x01') + frame(b'\x02')
+    assert bounds(audio + id3v1()) == (0, len(audio))
+
+def test_xing_and_info_frames_are_skipped():
+    audio = frame(b'\x01')
+    assert bounds(frame(tag=b'Xing') + audio) == (FRAME_LENGTH, FRAME_LENGTH + len(audio))
+    assert bounds(frame(tag=b'Info', mono=True) + audio) == (FRAME_LENGTH, FRAME_LENGTH + len(audio))
+
+def test_padded_vbri_frame_is_skipped_after_id3():
+    audio = frame(b'\x01')
+    data = id3v2(20) + frame(padding=True, tag=b'VBRI', tag_offset=32) + audio
+    start = 30 + FRAME_LENGTH + 1
+    assert bounds(data) == (start, start + len(audio))
+
+def test_tag_only_file_has_empty_bounds():
+    data = id3v2(300)
+    start, end = bounds(data)
+    assert start == end
+
+def stitch(tmp_path, segments):
+    """Write segments to files and stitch them as synthesize_to_file does"""
+    paths = []
+    for index, segment in enumerate(segments):
+        path = tmp_path / f"part{index}.mp3"
+        path.write_bytes(segment)
+        paths.append(str(path))
+    out = io.BytesIO()
+    tts.stitch_mp3_files(paths, out)
+    return out.getvalue()
+
+def test_stitch_keeps_only_audio_frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, 'CHUNK_SIZE', 100)
+    segments = [
+        id3v2(50) + frame(tag=b'Xing') + frame(b'\x01'),
+        frame(tag=b'Info') + frame(b'\x02') + id3v1(),
+        id3v2(10, footer=True) + frame(tag=b'VBRI', tag_offset=32) + frame(b'\x03') + frame(b'\x04')
+    ]
+    assert stitch(tmp_path, segments) == frame(b'\x01') + frame(b'\x02') + frame(b'\x03') + frame(b'\x04')
+
+def test_synthesize_to_file_stitches_segments_in_order(tmp_path):
+    text = "First paragraph.\n\nSecond paragraph.\nThird paragraph."
+    fills = {'First paragraph.': b'\x01', 'Second paragraph.': b'\x02', 'Third paragraph.': b'\x03'}
+    contexts = []
+
+    def stream_segment(segment, previous_text, next_text, out):
+        contexts.append((previous_text, segment, next_text))
+        out.write(id3v2(20) + frame(tag=b'Xing') + frame(fills[segment]))
+        return True
+
+    audio_file = tmp_path / 'analysis.mp3'
+    assert tts.synthesize_to_file(text, str(audio_file), stream_segment, parallel=True)
+    assert audio_file.read_bytes() == frame(b'\x01') + frame(b'\x02') + frame(b'\x03')
+    assert sorted(contexts, key=lambda c: list(fills).index(c[1])) == [
+        (None, 'First paragraph.', 'Second paragraph.'),
+        ('First paragraph.', 'Second paragraph.', 'Third paragraph.'),
+        ('Second paragraph.', 'Third paragraph.', None)
+    ]
+    assert [path.name for path in tmp_path.iterdir()] == ['analysis.mp3']
+
+def test_synthesize_to_file_keeps_single_request_output(tmp_path):
+    segment = id3v2(20) + frame(tag=b'Xing') + frame(b'\x01')
+
+    def stream_segment(text, previous_text, next_text, out):
+        out.write(segment)
+        return True
+
+    audio_file = tmp_path / 'analysis.mp3'
+    assert tts.synthesize_to_file("One paragraph.", str(audio_file), stream_segment, parallel=True)
+    assert audio_file.read_bytes() == segment
+
+def test_synthesize_to_file_fails_without_partial_output(tmp_path):
+    def stream_segment(segment, previous_text, next_text, out):
+        out.write(frame(b'\x01'))
+        return segment != 'Second.'
+
+    audio_file = tmp_path / 'analysis.mp3'
+    assert not tts.synthesize_to_file("First.\nSecond.", str(audio_file), stream_segment, parallel=True)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,158 @@
+import os
+import json
+from disk_cache import DiskCache
+from provider_limits import provider_slot
+
+# Shared on-disk translation cache, reused by every country module and across restarts
+TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', os.path.join('archive', 'cache', 'translations.sqlite3'))
+TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', str(30 * 24 * 3600)))  # 30 days
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '50000'))
+
+# Batched requests pack several strings into one, one string per line,
+# staying below Google Translate's 5000 character request limit
+BATCH_SEPARATOR = '\n'
+BATCH_MAX_CHARS = 4500
+
+# Google Translate still expects the legacy code for Hebrew
+LANGUAGE_ALIASES = {
+    'he': 'iw'
+}
+
+_cache = DiskCache(
+    TRANSLATION_CACHE_PATH,
+    ttl_seconds=TRANSLATION_CACHE_TTL,
+    max_entries=TRANSLATION_CACHE_MAX_ENTRIES
+)
+
+def get_translator(source, target):
+    """GoogleTranslator for a language pair (deep_translator is imported on first use)"""
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source=source, target=target)
+
+def normalize_language(lang_code):
+    """Map language codes to the ones Google Translate accepts"""
+    return LANGUAGE_ALIASES.get(lang_code, lang_code)
+
+def cache_key(text, source, target):
+    """Build the cache key for a (source, target, text) triple"""
+    return json.dumps([source, target, text], ensure_ascii=False)
+
+def get_cached(text, source, target):
+    """Look up a cached translation, None if missing"""
+    return _cache.get(cache_key(text, normalize_language(source), normalize_language(target)))
+
+def store_cached(text, source, target, translated):
+    """Remember a translation in the shared cache"""
+    _cache.set(cache_key(text, normalize_language(source), normalize_language(target)), translated)
+
+def translate(text, source='auto', target='en'):
+    """Translate text, serving repeated requests from the shared disk cache
+
+    Translator errors are raised so callers keep their own fallbacks.
+    """
+    source = normalize_language(source)
+    target = normalize_language(target)
+    key = cache_key(text, source, target)
+
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    translator = get_translator(source, target)
+    with provider_slot('google_translate'):
+        translated = translator.translate(text)
+
+    if translated:
+        _cache.set(key, translated)
+    return translated
+
+def is_ascii_text(text):
+    """Check if text is plain ASCII (likely English already)"""
+    return all(ord(char) < 128 for char in text.replace(' ', ''))
+
+def pack_batches(texts):
+    """Group texts into chunks that each fit in a single request"""
+    batches = []
+    current = []
+    current_size = 0
+    for text in texts:
+        size = len(text) + len(BATCH_SEPARATOR)
+        if current and current_size + size > BATCH_MAX_CHARS:
+            batches.append(current)
+            current = []
+            current_size = 0
+        current.append(text)
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches
+
+def is_packable(text):
+    """Check if text can share a batched request (newlines would break unpacking)"""
+    return BATCH_SEPARATOR not in text and len(text) < BATCH_MAX_CHARS
+
+def unpack_batch(batch, translated):
+    """Split a packed translation back into one result per input, None if the shape changed"""
+    if not translated:
+        return None
+    lines = [line.strip() for line in translated.split(BATCH_SEPARATOR)]
+    if len(lines) != len(batch):
+        print(f"Batched translation returned {len(lines)} lines for {len(batch)} texts, falling back to single requests")
+        return None
+    return lines
+
+def _translate_packed(batch, source, target):
+    """Translate a chunk of texts in one request, returning None if it can't be unpacked"""
+    translator = get_translator(source, target)
+    with provider_slot('google_translate'):
+        translated = translator.translate(BATCH_SEPARATOR.join(batch))
+    return unpack_batch(batch, translated)
+
+def translate_batch(texts, source='auto', target='en'):
+    """Translate many strings of one language pair with as few requests as possible
+
+    Cached strings are served locally, the rest are packed one per line into
+    as few requests as fit the size limit. Results come back in input order;
+    a string that can't be translated is returned unchanged.
+    """
+    source = normalize_language(source)
+    target = normalize_language(target)
+
+    results = {}
+    pending = []
+    for text in texts:
+        if text in results or text in pending:
+            continue
+        cached = _cache.get(cache_key(text, source, target))
+        if cached is not None:
+            results[text] = cached
+        elif not text.strip():
+            results[text] = text
+        else:
+            pending.append(text)
+
+    packable = [text for text in pending if is_packable(text)]
+    singles = [text for text in pending if text not in packable]
+
+    for batch in pack_batches(packable):
+        try:
+            lines = _translate_packed(batch, source, target)
+        except Exception as e:
+            print(f"Batched translation error: {str(e)}")
+            lines = None
+        if lines is None:
+            singles.extend(batch)
+            continue
+        for text, translated in zip(batch, lines):
+            results[text] = translated or text
+            if translated:
+                _cache.set(cache_key(text, source, target), translated)
+
+    for text in singles:
+        try:
+            results[text] = translate(text, source=source, target=target) or text
+        except Exception as e:
+            print(f"Translation error for '{text}': {str(e)}")
+            results[text] = text
+
+    return [results[text] for text in texts]
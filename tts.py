@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import provider_http
+from provider_limits import provider_slot
+
+ELEVENLABS_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.5
+}
+
+# Split long analyses into paragraphs (and over-long paragraphs into sentence
+# groups) and synthesize them concurrently. Set TTS_PARALLEL=0 to send the
+# whole text in one request.
+TTS_PARALLEL = os.getenv('TTS_PARALLEL', '1') != '0'
+SEGMENT_MAX_CHARS = int(os.getenv('TTS_SEGMENT_MAX_CHARS', '1000'))
+MAX_WORKERS = 4
+
+# Responses are streamed to disk in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+# Content-addressed cache of synthesized MP3s, keyed by provider, voice, model,
+# voice settings and text. Archive files are hard links to the cached copy.
+TTS_CACHE_ENABLED = os.getenv('TTS_CACHE', '1') != '0'
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join('archive', 'cache', 'tts'))
+
+# MPEG audio Layer III tables, used to find and drop Xing/Info header frames
+_BITRATES = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000]    # MPEG-2.5
+}
+
+def split_sentences(text, max_chars):
+    """Group sentences into chunks of at most max_chars (a single long sentence stays whole)"""
+    sentences = [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+    groups = []
+    current = ''
+    for sentence in sentences:
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            groups.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        groups.append(current)
+    return groups
+
+def split_segments(text, max_chars=None):
+    """Split text into paragraphs, breaking paragraphs longer than max_chars into sentence groups"""
+    max_chars = max_chars or SEGMENT_MAX_CHARS
+    segments = []
+    for paragraph in text.replace('\r\n', '\n').split('\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            segments.append(paragraph)
+        else:
+            segments.extend(split_sentences(paragraph, max_chars))
+    return segments
+
+def _first_frame_length(data):
+    """Length of the MPEG Layer III frame at the start of data, or None"""
+    if len(data) < 4 or data[0] != 0xFF or (data[1] & 0xE0) != 0xE0:
+        return None
+    version = (data[1] >> 3) & 0x03
+    layer = (data[1] >> 1) & 0x03
+    bitrate_index = data[2] >> 4
+    sample_rate_index = (data[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = _BITRATES['mpeg1' if version == 3 else 'mpeg2'][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (data[2] >> 1) & 0x01
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+def _is_vbr_header(frame):
+    """Check whether a frame is a Xing/Info/VBRI header rather than audio"""
+    version = (frame[1] >> 3) & 0x03
+    mono = (frame[3] >> 6) == 3
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing_offset = 4 + side_info
+    return frame[xing_offset:xing_offset + 4] in (b'Xing', b'Info') or frame[36:40] == b'VBRI'
+
+def _frame_bounds(read_at, size):
+    """Find the (start, end) byte range holding audio frames
+
+    Skips ID3v2 headers, ID3v1 trailers and a leading Xing/Info/VBRI frame, whose
+    frame count would be wrong after stitching. read_at(offset, length) returns bytes.
+    """
+    start = 0
+    end = size
+    head = read_at(0, 10)
+    if head[:3] == b'ID3' and len(head) == 10:
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+    if end - start >= 128 and read_at(end - 128, 3) == b'TAG':
+        end -= 128
+    frame = read_at(start, 48)
+    frame_length = _first_frame_length(frame)
+    if frame_length and _is_vbr_header(frame):
+        start += frame_length
+    return start, max(start, end)
+
+def stitch_mp3_files(paths, out):
+    """Copy the audio frames of MP3 files into out, chunk by chunk, without re-encoding"""
+    for path in paths:
+        with open(path, 'rb') as f:
+            def read_at(offset, length):
+                f.seek(offset)
+                return f.read(length)
+            start, end = _frame_bounds(read_at, os.path.getsize(path))
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+
+def _temp_file(directory, suffix='.tmp'):
+    """Open a temporary file in the destination directory so the final rename is atomic"""
+    return tempfile.NamedTemporaryFile(delete=False, mode='wb', dir=directory, suffix=suffix)
+
+def synthesize_to_file(text, audio_file, stream_segment, parallel=None):
+    """Synthesize text into audio_file, streaming audio to disk as it arrives
+
+    Args:
+        text: Text to speak
+        audio_file: Destination MP3 path
+        stream_segment: Callable (segment, previous_text, next_text, out) that writes
+            MP3 bytes to the file object out and returns True on success
+        parallel: Split into segments and synthesize them concurrently (defaults to TTS_PARALLEL)
+
+    Each segment is written to a temporary file in the destination directory;
+    the result is renamed into place atomically. Returns True on success.
+    """
+    parallel = TTS_PARALLEL if parallel is None else parallel
+    directory = os.path.dirname(audio_file) or '.'
+    segments = split_segments(text) if parallel else []
+    temp_paths = []
+
+    try:
+        if len(segments) < 2:
+            with _temp_file(directory) as out:
+                temp_paths.append(out.name)
+                if not stream_segment(text, None, None, out):
+                    return False
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(out.name, audio_file)
+            return True
+
+        def run(index):
+            previous_text = segments[index - 1] if index > 0 else None
+            next_text = segments[index + 1] if index + 1 < len(segments) else None
+            with _temp_file(directory, suffix='.part') as out:
+                temp_paths.append(out.name)
+                ok = stream_segment(segments[index], previous_text, next_text, out)
+            return out.name if ok else None
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(segments)), thread_name_prefix='tts') as executor:
+            parts = list(executor.map(run, range(len(segments))))
+
+        if not all(parts):
+            print(f"Text-to-speech failed for {sum(1 for p in parts if not p)} of {len(segments)} segments")
+            return False
+
+        with _temp_file(directory) as out:
+            temp_paths.append(out.name)
+            stitch_mp3_files(parts, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(out.name, audio_file)
+        return True
+    finally:
+        for path in temp_paths:
+            try:
+                if os.path.exists(path):
+                    os.unlink(path)
+            except Exception as e:
+                print(f"Error cleaning up temporary file: {str(e)}")
+
+def cache_key(provider, voice, model, voice_settings, text):
+    """Hash everything that determines the synthesized audio"""
+    payload = json.dumps([provider, voice, model, voice_settings, text], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def cache_path(key):
+    """Location of the cached MP3 for a key"""
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.mp3")
+
+def link_file(source, audio_file):
+    """Place source at audio_file as a hard link, copying if linking isn't possible
+
+    The link (or copy) is created under a temporary name and renamed into place,
+    so audio_file never appears half-written.
+    """
+    directory = os.path.dirname(audio_file) or '.'
+    with _temp_file(directory) as temp:
+        temp_path = temp.name
+    try:
+        os.unlink(temp_path)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, audio_file)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def link_cached(key, audio_file):
+    """Serve audio_file from the cache, returning False on a miss"""
+    if not TTS_CACHE_ENABLED:
+        return False
+    path = cache_path(key)
+    if not os.path.exists(path):
+        return False
+    try:
+        link_file(path, audio_file)
+        print(f"Audio served from TTS cache: {path}")
+        return True
+    except Exception as e:
+        print(f"Error reading TTS cache: {str(e)}")
+        return False
+
+def cached_synthesis(key, audio_file, synthesize_into):
+    """Write audio_file from the cache, or synthesize into the cache and link it
+
+    Args:
+        key: cache_key() of the request
+        audio_file: Destination MP3 path
+        synthesize_into: Callable (path) that synthesizes the audio into path, returning True on success
+    """
+    if link_cached(key, audio_file):
+        return True
+    if not TTS_CACHE_ENABLED:
+        return synthesize_into(audio_file)
+
+    path = cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    except Exception as e:
+        print(f"Error creating TTS cache directory: {str(e)}")
+        return synthesize_into(audio_file)
+    if not synthesize_into(path):
+        return False
+    link_file(path, audio_file)
+    return True
+
+def elevenlabs_tts(text, audio_file, voice_id, model_id, voice_settings=None, parallel=None):
+    """Synthesize text with ElevenLabs into audio_file, returning True on success"""
+    voice_settings = voice_settings or DEFAULT_VOICE_SETTINGS
+
+    def stream_segment(segment, previous_text, next_text, out):
+        headers = {
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": os.getenv('ELEVENLABS_API_KEY')
+        }
+        data = {
+            "text": segment,
+            "model_id": model_id,
+            "voice_settings": voice_settings
+        }
+        # Neighbouring text keeps intonation continuous across segment boundaries
+        if previous_text:
+            data["previous_text"] = previous_text
+        if next_text:
+            data["next_text"] = next_text
+
+        url = ELEVENLABS_URL.format(voice_id=voice_id)
+        response = provider_http.post(url, provider='elevenlabs', json=data, headers=headers, timeout=(10, 120), stream=True)
+        with response:
+            if response.status_code != 200:
+                print(f"Error: ElevenLabs API request failed with status code {response.status_code}")
+                print(f"Response: {response.text}")
+                return False
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                out.write(chunk)
+        return True
+
+    key = cache_key('elevenlabs', voice_id, model_id, voice_settings, text)
+    return cached_synthesis(key, audio_file, lambda path: synthesize_to_file(text, path, stream_segment, parallel))
+
+def openai_tts(client, text, audio_file, voice, model, parallel=None):
+    """Synthesize text with OpenAI's TTS API into audio_file, returning True on success"""
+    def stream_segment(segment, previous_text, next_text, out):
+        with provider_slot('openai'):
+            with client.audio.speech.with_streaming_response.create(
+                model=model,
+                voice=voice,
+                input=segment
+            ) as response:
+                for chunk in response.iter_bytes(chunk_size=CHUNK_SIZE):
+                    out.write(chunk)
+        return True
+
+    key = cache_key('openai', voice, model, None, text)
+    return cached_synthesis(key, audio_file, lambda path: synthesize_to_file(text, path, stream_segment, parallel))